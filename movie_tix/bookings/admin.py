@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Theater, Showtime, Seat, Booking
+from .models import Theater, Showtime, Seat, Booking, SeatReservation
 
 @admin.register(Theater)
 class TheaterAdmin(admin.ModelAdmin):
@@ -8,10 +8,11 @@ class TheaterAdmin(admin.ModelAdmin):
 
 @admin.register(Showtime)
 class ShowtimeAdmin(admin.ModelAdmin):
-    list_display = ('movie', 'theater', 'date', 'time', 'price', 'get_available_seats')
+    list_display = ('movie', 'theater', 'date', 'time', 'price', 'seats_booked', 'seats_available')
     list_filter = ('date', 'theater')
     search_fields = ('movie__title',)
     date_hierarchy = 'date'
+    readonly_fields = ('seats_booked', 'seats_available')
 
 @admin.register(Seat)
 class SeatAdmin(admin.ModelAdmin):
@@ -24,3 +25,9 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = ('status', 'booking_time', 'showtime__date')
     search_fields = ('user__username', 'showtime__movie__title')
     readonly_fields = ('booking_time', 'booking_reference')
+
+@admin.register(SeatReservation)
+class SeatReservationAdmin(admin.ModelAdmin):
+    list_display = ('showtime', 'seat', 'booking', 'created_at')
+    list_filter = ('showtime__date',)
+    raw_id_fields = ('showtime', 'seat', 'booking')
@@ -1,6 +1,10 @@
+import base64
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
@@ -11,8 +15,16 @@ from .serializers import (
     SeatSerializer,
     BookingSerializer,
 )
+from .availability import AvailabilityService
+from .booking_queue import BookingQueue, BookingQueueError
 from .payment import PaymentService, PaymentError
 from .email_service import EmailService
+from .inventory import SeatInventory, SeatUnavailableError
+from .seat_finder import BestAvailableFinder
+from .seatmap import SeatMapService
+from .seat_holds import SeatHoldService, SeatHoldError, SeatHoldConflictError, SeatHoldExpiredError
+from .ticket_batch import BatchTicketRenderer, PER_BOOKING, PER_SEAT
+from .ticket_codes import TicketCode, InvalidTicketCodeError, ExpiredTicketCodeError
 
 
 class TheaterViewSet(viewsets.ModelViewSet):
@@ -46,21 +58,199 @@ class ShowtimeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(showtimes, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def schedule(self, request):
+        """
+        Date/time/theater/availability matrix for a movie's next `days` days.
+        """
+        movie_id = request.query_params.get('movie_id')
+        if not movie_id:
+            return Response(
+                {"error": "movie_id parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            movie_id = int(movie_id)
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response(
+                {"error": "movie_id and days must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates, showtimes_by_date = AvailabilityService.get_schedule(movie_id, days=days)
+        return Response({
+            'dates': [date.isoformat() for date in dates],
+            'showtimes_by_date': showtimes_by_date,
+        })
+
     @action(detail=True, methods=['get'])
     def available_seats(self, request, pk=None):
         """
         Get available seats for a specific showtime.
         """
         showtime = self.get_object()
-        booked_seat_ids = Seat.objects.filter(
-            bookings__showtime=showtime,
-            bookings__status='confirmed'
-        ).values_list('id', flat=True)
+        reserved_seat_ids = SeatInventory.get_reserved_seat_ids(showtime.id)
 
-        available_seats = Seat.objects.exclude(id__in=booked_seat_ids).order_by('row', 'number')
+        available_seats = Seat.objects.exclude(id__in=reserved_seat_ids).order_by('row', 'number')
         serializer = SeatSerializer(available_seats, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def seatmap(self, request, pk=None):
+        """
+        Compact seat map: theater layout plus a base64 occupancy bitset.
+        Pass `layout=0` to receive only the occupancy once the layout is known.
+        Supports If-None-Match: unchanged maps return 304 without a database query.
+        """
+        try:
+            showtime_id = int(pk)
+        except ValueError:
+            return Response({"error": "Showtime not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        with_layout = request.query_params.get('layout') != '0'
+        version = SeatMapService.get_version(showtime_id)
+        etag = SeatMapService.get_etag(showtime_id, version, with_layout)
+        if_none_match = SeatMapService.parse_if_none_match(request.headers.get('If-None-Match'))
+        if etag in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        seat_map = SeatMapService.get_seat_map(showtime_id, version)
+        if seat_map is None:
+            return Response({"error": "Showtime not found"}, status=status.HTTP_404_NOT_FOUND)
+        if '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if not with_layout:
+            seat_map = {key: value for key, value in seat_map.items() if key != 'layout'}
+        return Response(seat_map, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+    @action(detail=True, methods=['get', 'post'])
+    def best_available(self, request, pk=None):
+        """
+        Best contiguous blocks of `count` seats (default 2), top `k` (default 3).
+        POST holds the best block that is still free and returns it with its hold.
+        """
+        params = request.data if request.method == 'POST' else request.query_params
+        try:
+            count = int(params.get('count', 2))
+            top_k = min(int(params.get('k', 3)), 10)
+        except (TypeError, ValueError):
+            return Response({"error": "count and k must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        showtime = self.get_object()
+        seat_map = SeatMapService.get_seat_map(showtime.id)
+        occupancy = base64.b64decode(seat_map['occupancy'])
+        blocks = BestAvailableFinder(seat_map['layout'], occupancy).find(count, top_k)
+
+        if request.method == 'GET':
+            return Response({"count": count, "blocks": blocks})
+
+        # The map may predate claims committed since; like hold(), check them before holding anything
+        claimed = set(SeatInventory.get_reserved_seat_ids(showtime.id))
+        if any(claimed.intersection(block['seat_ids']) for block in blocks):
+            claimed_bits = SeatMapService.encode_occupancy(seat_map['layout'], claimed)
+            occupancy = bytes(a | b for a, b in zip(occupancy, claimed_bits))
+            blocks = BestAvailableFinder(seat_map['layout'], occupancy).find(count, top_k)
+
+        # Another customer may grab a block between the map snapshot and the hold: try the next one
+        for block in blocks:
+            try:
+                seat_hold = SeatHoldService.hold(showtime.id, block['seat_ids'], request.user.id)
+            except SeatHoldConflictError:
+                continue
+            except SeatHoldError as e:
+                return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return Response({"block": block, "hold": seat_hold.to_dict()}, status=status.HTTP_201_CREATED)
+
+        return Response(
+            {"error": f"No block of {count} adjacent seats is available"},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    @action(detail=True, methods=['post'])
+    def hold(self, request, pk=None):
+        """
+        Hold seats for the current user while they pay.
+        Expects `seat_ids`; returns a `hold_token` valid for SEAT_HOLD_TTL seconds.
+        """
+        showtime = self.get_object()
+        seat_ids = request.data.get('seat_ids') or []
+        try:
+            seat_ids = [int(seat_id) for seat_id in seat_ids]
+        except (TypeError, ValueError):
+            return Response({"error": "seat_ids must be a list of seat IDs"}, status=status.HTTP_400_BAD_REQUEST)
+        if not seat_ids or Seat.objects.filter(id__in=seat_ids).count() != len(set(seat_ids)):
+            return Response({"error": "seat_ids must be a list of seat IDs"}, status=status.HTTP_400_BAD_REQUEST)
+
+        claimed = set(SeatInventory.get_reserved_seat_ids(showtime.id).filter(seat_id__in=seat_ids))
+        if claimed:
+            return Response(
+                {"error": "Some seats are already booked", "unavailable_seat_ids": sorted(claimed)},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            seat_hold = SeatHoldService.hold(showtime.id, seat_ids, request.user.id)
+        except SeatHoldConflictError as e:
+            return Response(
+                {"error": "Some seats are held by another customer", "unavailable_seat_ids": e.seat_ids},
+                status=status.HTTP_409_CONFLICT
+            )
+        except SeatHoldError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(seat_hold.to_dict(), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def extend_hold(self, request, pk=None):
+        """
+        Extend the current user's seat hold by another SEAT_HOLD_TTL seconds.
+        """
+        showtime = self.get_object()
+        token = request.data.get('hold_token')
+        if not token:
+            return Response({"error": "hold_token is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            expires_at = SeatHoldService.extend(showtime.id, token, request.user.id)
+        except SeatHoldExpiredError as e:
+            return Response({"error": str(e)}, status=status.HTTP_410_GONE)
+        except SeatHoldError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"hold_token": token, "expires_at": expires_at.isoformat()})
+
+    @action(detail=True, methods=['post'])
+    def release_hold(self, request, pk=None):
+        """
+        Release the current user's seat hold before it expires.
+        """
+        showtime = self.get_object()
+        token = request.data.get('hold_token')
+        if not token:
+            return Response({"error": "hold_token is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            released = SeatHoldService.release(showtime.id, token, request.user.id)
+        except SeatHoldError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"released_seat_ids": released})
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def print_tickets(self, request, pk=None):
+        """
+        Box office: every confirmed ticket of the showtime in one PDF.
+        `per=seat` prints a page per seat, `per=booking` (default) a page per booking.
+        """
+        showtime = self.get_object()
+        per = request.query_params.get('per', PER_BOOKING)
+        if per not in (PER_BOOKING, PER_SEAT):
+            return Response({"error": "per must be 'booking' or 'seat'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        output, pages = BatchTicketRenderer.render(BatchTicketRenderer.bookings_for_showtime(showtime), per)
+        response = FileResponse(
+            output, as_attachment=True, filename=f"showtime_{showtime.id}_tickets.pdf", content_type='application/pdf'
+        )
+        response['X-Ticket-Pages'] = str(pages)
+        return response
+
 
 class SeatViewSet(viewsets.ModelViewSet):
     """
@@ -97,6 +287,64 @@ class BookingViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(bookings, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def claim_status(self, request):
+        """
+        Outcome of a queued seat claim. Status is one of queued, confirmed, rejected or failed.
+        """
+        request_id = request.query_params.get('request_id')
+        if not request_id:
+            return Response({"error": "request_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = BookingQueue.get_result(request_id)
+        except BookingQueueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if result is None or not (request.user.is_staff or result.get('user_id') == request.user.id):
+            return Response({"error": "Unknown or expired request"}, status=status.HTTP_404_NOT_FOUND)
+
+        result.pop('user_id', None)
+        return Response({"request_id": request_id, **result})
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def validate_ticket(self, request):
+        """
+        Door check for a scanned ticket code. The signature and expiry are
+        checked without the database (scanners holding the key can do the same
+        offline); this endpoint also makes sure the booking is still confirmed,
+        still holds the seats the code admits and, given `showtime_id`, that
+        the ticket is for that showtime.
+        """
+        code = request.data.get('code')
+        if not code:
+            return Response({"error": "code is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(code, str):
+            return Response({"error": "code must be a string"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            claim = TicketCode.decode(code)
+        except ExpiredTicketCodeError as e:
+            return Response({"valid": False, "error": str(e), **e.claim}, status=status.HTTP_410_GONE)
+        except InvalidTicketCodeError as e:
+            return Response({"valid": False, "error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        showtime_id = request.data.get('showtime_id')
+        if showtime_id is not None and str(showtime_id) != str(claim['showtime_id']):
+            return Response({"valid": False, "error": "Ticket is for another showtime", **claim},
+                            status=status.HTTP_409_CONFLICT)
+
+        booking = Booking.objects.filter(id=claim['booking_id'], showtime_id=claim['showtime_id']).first()
+        if booking is None or booking.status != 'confirmed':
+            return Response({"valid": False, "error": "Booking is no longer confirmed", **claim},
+                            status=status.HTTP_409_CONFLICT)
+
+        # Seats may have been released from the booking since the code was issued
+        booked_seats = {str(seat) for seat in booking.seats.all()}
+        if not set(claim['seats']) <= booked_seats:
+            return Response({"valid": False, "error": "Ticket admits seats no longer in the booking", **claim},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({"valid": True, "booking_reference": str(booking.booking_reference), **claim})
+
     @action(detail=True, methods=['post'])
     def confirm_payment(self, request, pk=None):
         """
@@ -125,9 +373,33 @@ class BookingViewSet(viewsets.ModelViewSet):
         try:
             payment_service = PaymentService()
             if payment_service.confirm_payment(booking.payment_id):
-                with transaction.atomic():
-                    booking.status = 'confirmed'
+                if settings.BOOKING_QUEUE_ENABLED:
+                    # Flash-sale mode: the partition writer claims the seats, poll claim_status for the outcome
+                    seat_ids = booking.seats.values_list('id', flat=True)
+                    try:
+                        request_id = BookingQueue.submit(booking, seat_ids)
+                    except BookingQueueError as e:
+                        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                    return Response(
+                        {"request_id": request_id, "status": "queued"},
+                        status=status.HTTP_202_ACCEPTED
+                    )
+
+                try:
+                    with transaction.atomic():
+                        SeatInventory.claim_seats(booking, booking.seats.all())
+                        booking.status = 'confirmed'
+                        booking.save()
+                except SeatUnavailableError as e:
+                    # The payment is already captured: cancel the booking and give the money back
+                    booking.status = 'cancelled'
+                    booking.notes = f"{booking.notes}\n{e}".strip()
                     booking.save()
+                    PaymentService.refund_rejected_booking(booking, e)
+                    return Response(
+                        {"error": str(e), "reserved_seats": e.seat_labels, "refund": "scheduled"},
+                        status=status.HTTP_409_CONFLICT
+                    )
 
                 EmailService.send_booking_confirmation(booking)
                 serializer = self.get_serializer(booking)
@@ -0,0 +1,53 @@
+import datetime
+
+from django.utils import timezone
+
+from .models import Showtime
+
+
+class AvailabilityService:
+    """Read-side availability for the booking funnel, built from a single query."""
+
+    MAX_DAYS = 14
+
+    @staticmethod
+    def get_schedule(movie_id, days=7, start_date=None):
+        """
+        Return (dates, showtimes_by_date) for a movie's next `days` days.
+
+        Every showtime, its theater and its seat count come from one query:
+        the theater is joined in and availability is read from the showtime's
+        seat counters.
+        """
+        days = max(1, min(days, AvailabilityService.MAX_DAYS))
+        start_date = start_date or timezone.now().date()
+        dates = [start_date + datetime.timedelta(days=i) for i in range(days)]
+
+        showtimes_by_date = {date.strftime('%Y-%m-%d'): [] for date in dates}
+        showtimes = Showtime.objects.filter(
+            movie_id=movie_id,
+            date__gte=dates[0],
+            date__lte=dates[-1]
+        ).select_related('theater').order_by('date', 'time')
+
+        for showtime in showtimes:
+            showtimes_by_date[showtime.date.strftime('%Y-%m-%d')].append(
+                AvailabilityService.serialize_showtime(showtime)
+            )
+        return dates, showtimes_by_date
+
+    @staticmethod
+    def serialize_showtime(showtime):
+        return {
+            'id': showtime.id,
+            'time': showtime.time.strftime('%H:%M'),
+            'theater': {
+                'id': showtime.theater.id,
+                'name': showtime.theater.name,
+                'has_imax': showtime.theater.has_imax,
+                'has_3d': showtime.theater.has_3d
+            },
+            'price': float(showtime.price),
+            'student_price': float(showtime.student_price),
+            'available_seats': showtime.seats_available
+        }
@@ -0,0 +1,221 @@
+import json
+import logging
+import uuid
+import zlib
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from movie_tix.redis_client import get_redis_client
+from .email_service import EmailService
+from .inventory import SeatInventory, SeatUnavailableError
+from .models import Booking, Seat
+from .payment import PaymentService
+from .seat_holds import SeatHoldService, SeatHoldError
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PREFIX = 'bookingq'
+RESULT_TTL = 60 * 60
+LOCK_TIMEOUT = 60
+
+
+class BookingQueue:
+    """
+    Optional single-writer pipeline for seat claims (BOOKING_QUEUE_ENABLED).
+
+    Claims are appended to a Redis list per partition (crc32 of the showtime
+    ID) and drained in order, in small batches, by a Celery task routed to
+    that partition's queue. A Redis lock keeps one drainer per partition even
+    if several workers consume the queue, so claims for a showtime never wait
+    on each other's row locks. Clients poll get_result() with the request ID.
+
+    Each item is moved to a processing list while it is handled and only
+    removed once its outcome is committed; a drainer that dies mid-item
+    leaves it there for the next drain to finish. Items that raise are moved
+    to a failed list for inspection. A claim that loses its seats gets its
+    payment refunded and the customer is emailed (tasks.refund_rejected_booking).
+    """
+
+    @staticmethod
+    def partition_for(showtime_id):
+        return zlib.crc32(str(showtime_id).encode()) % settings.BOOKING_QUEUE_PARTITIONS
+
+    @staticmethod
+    def queue_name(partition):
+        return f'bookings.p{partition}'
+
+    @staticmethod
+    def _list_key(partition):
+        return f'{QUEUE_PREFIX}:{partition}'
+
+    @staticmethod
+    def _processing_key(partition):
+        return f'{QUEUE_PREFIX}:{partition}:processing'
+
+    @staticmethod
+    def _failed_key(partition):
+        return f'{QUEUE_PREFIX}:{partition}:failed'
+
+    @staticmethod
+    def _result_key(request_id):
+        return f'{QUEUE_PREFIX}:result:{request_id}'
+
+    @staticmethod
+    def submit(booking, seat_ids, hold=None):
+        """
+        Queue a claim of `seat_ids` for a pending booking. `hold` is an optional
+        {'showtime_id', 'token'} seat hold to release once the claim is decided.
+        Returns the request ID to poll.
+        """
+        request_id = uuid.uuid4().hex
+        partition = BookingQueue.partition_for(booking.showtime_id)
+        item = {
+            'request_id': request_id,
+            'booking_id': booking.id,
+            'seat_ids': [int(seat_id) for seat_id in seat_ids],
+            'hold': hold,
+        }
+
+        try:
+            pipe = get_redis_client().pipeline()
+            pipe.set(BookingQueue._result_key(request_id), json.dumps({
+                'status': 'queued', 'booking_id': booking.id, 'user_id': booking.user_id,
+            }), ex=RESULT_TTL)
+            pipe.rpush(BookingQueue._list_key(partition), json.dumps(item))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Booking queue backend error: {e}")
+            raise BookingQueueError("Booking queue is temporarily unavailable") from e
+
+        BookingQueue._schedule_drain(partition)
+        logger.info(f"Queued claim {request_id} for booking {booking.id} on partition {partition}")
+        return request_id
+
+    @staticmethod
+    def _schedule_drain(partition):
+        from .tasks import process_booking_queue
+        process_booking_queue.apply_async(args=[partition], queue=BookingQueue.queue_name(partition))
+
+    @staticmethod
+    def get_result(request_id):
+        """Latest status of a queued claim, or None once it has expired"""
+        try:
+            data = get_redis_client().get(BookingQueue._result_key(request_id))
+        except redis.RedisError as e:
+            raise BookingQueueError("Booking queue is temporarily unavailable") from e
+        return json.loads(data) if data else None
+
+    @staticmethod
+    def drain(partition):
+        """Process the partition's queued claims in order. Returns the number processed."""
+        client = get_redis_client()
+        lock = client.lock(f'{QUEUE_PREFIX}:{partition}:lock', timeout=LOCK_TIMEOUT, blocking_timeout=0)
+        if not lock.acquire():
+            # Another drainer owns this partition and will pick up our items
+            return 0
+
+        queue_key = BookingQueue._list_key(partition)
+        processing_key = BookingQueue._processing_key(partition)
+        processed = 0
+        try:
+            # Items a crashed drainer had taken but not finished come first; they are older
+            for raw in client.lrange(processing_key, 0, -1):
+                logger.warning(f"Recovering unfinished claim on partition {partition}: {raw}")
+                BookingQueue._process_safely(client, partition, raw)
+                processed += 1
+
+            while True:
+                # The item stays in the processing list until its outcome is committed
+                raw = client.lmove(queue_key, processing_key, 'LEFT', 'RIGHT')
+                if raw is None:
+                    break
+                BookingQueue._process_safely(client, partition, raw)
+                processed += 1
+                lock.extend(LOCK_TIMEOUT, replace_ttl=True)
+        finally:
+            lock.release()
+
+        # An item pushed while we held the lock may have had its drain skipped
+        if client.llen(queue_key):
+            BookingQueue._schedule_drain(partition)
+        return processed
+
+    @staticmethod
+    def _process_safely(client, partition, raw):
+        """Process one item; a failure is recorded and parked so it can't hold up the rest"""
+        try:
+            BookingQueue._process(json.loads(raw))
+        except Exception as e:
+            logger.exception(f"Claim failed on partition {partition}: {e}")
+            pipe = client.pipeline()
+            pipe.rpush(BookingQueue._failed_key(partition), raw)
+            pipe.lrem(BookingQueue._processing_key(partition), 1, raw)
+            pipe.execute()
+            try:
+                item = json.loads(raw)
+                BookingQueue._store_result(item['request_id'], {
+                    'status': 'failed', 'booking_id': item.get('booking_id'), 'message': 'Claim could not be processed',
+                })
+            except (ValueError, KeyError, TypeError, redis.RedisError):
+                pass
+            return
+        client.lrem(BookingQueue._processing_key(partition), 1, raw)
+
+    @staticmethod
+    def _process(item):
+        result = {'booking_id': item['booking_id']}
+        try:
+            booking = Booking.objects.select_related('showtime').get(id=item['booking_id'])
+        except Booking.DoesNotExist:
+            result.update(status='failed', message='Booking not found')
+            BookingQueue._store_result(item['request_id'], result)
+            return
+
+        result['user_id'] = booking.user_id
+        if booking.status != 'pending':
+            # Decided before a crash cut the drainer short; only the result and hold are left to settle
+            result.update(status='confirmed' if booking.status == 'confirmed' else 'rejected')
+            BookingQueue._release_hold(item.get('hold'))
+            BookingQueue._store_result(item['request_id'], result)
+            return
+
+        seats = list(Seat.objects.filter(id__in=item['seat_ids']))
+        try:
+            with transaction.atomic():
+                SeatInventory.claim_seats(booking, seats)
+                booking.status = 'confirmed'
+                booking.save()
+        except SeatUnavailableError as e:
+            booking.status = 'cancelled'
+            booking.notes = f"{booking.notes}\n{e}".strip()
+            booking.save()
+            PaymentService.refund_rejected_booking(booking, e)
+            result.update(status='rejected', message=str(e), reserved_seats=e.seat_labels, refund='scheduled')
+        else:
+            EmailService.send_booking_confirmation(booking)
+            result.update(status='confirmed')
+        finally:
+            BookingQueue._release_hold(item.get('hold'))
+
+        BookingQueue._store_result(item['request_id'], result)
+        logger.info(f"Claim {item['request_id']} for booking {booking.id}: {result['status']}")
+
+    @staticmethod
+    def _release_hold(hold):
+        if not hold:
+            return
+        try:
+            SeatHoldService.release(hold['showtime_id'], hold['token'])
+        except SeatHoldError as e:
+            logger.warning(f"Could not release seat hold {hold['token']}: {e}")
+
+    @staticmethod
+    def _store_result(request_id, result):
+        get_redis_client().set(BookingQueue._result_key(request_id), json.dumps(result), ex=RESULT_TTL)
+
+
+class BookingQueueError(Exception):
+    """Raised when the booking queue backend can't be reached"""
+    pass
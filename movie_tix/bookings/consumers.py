@@ -0,0 +1,49 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .seatmap import SeatMapService, seatmap_group_name
+
+logger = logging.getLogger(__name__)
+
+
+class SeatMapConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes seat claim/release deltas to everyone viewing a showtime's seat map.
+
+    On connect the client receives the current inventory version; it should
+    (re)fetch /api/showtimes/<id>/seatmap/ if its snapshot is older, then apply
+    `seats_changed` events in version order.
+    """
+
+    async def connect(self):
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+
+        self.showtime_id = int(self.scope['url_route']['kwargs']['showtime_id'])
+        self.group_name = seatmap_group_name(self.showtime_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        version = await sync_to_async(SeatMapService.get_version)(self.showtime_id)
+        await self.send_json({'type': 'hello', 'showtime_id': self.showtime_id, 'version': version})
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def seats_changed(self, event):
+        await self.send_json({
+            'type': 'seats_changed',
+            'showtime_id': event['showtime_id'],
+            'version': event['version'],
+            'occupied': event['occupied'],
+            'freed': event['freed'],
+        })
+
@@ -1,11 +1,11 @@
 import os
 import logging
 import importlib.util
-from io import BytesIO
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
-from .ticket_generator import TicketGenerator
+from .models import Booking
+from .ticket_store import TicketStore
 
 logger = logging.getLogger(__name__)
 
@@ -107,20 +107,19 @@ class EmailService:
         html_content = render_to_string('bookings/email/booking_confirmation.html', context)
         text_message = render_to_string('bookings/email/booking_confirmation.txt', context)
 
-        pdf_data = TicketGenerator.generate_ticket_pdf(booking)
-        if isinstance(pdf_data, BytesIO):
-            pdf_data = pdf_data.getvalue()
-        if not isinstance(pdf_data, bytes):
-            raise ValueError(f"Expected PDF data as bytes, got {type(pdf_data)}")
+        pdf_data = TicketStore.get_pdf(booking)
 
         recipient = EmailService._get_recipient_email(booking.user.email)
-        return EmailService._send_email_with_retry(
+        sent = EmailService._send_email_with_retry(
             subject=subject,
             text_message=text_message,
             html_content=html_content,
             recipient_email=recipient,
             attachments=[('ticket.pdf', pdf_data, 'application/pdf')]
         )
+        if sent:
+            Booking.objects.filter(id=booking.id).update(ticket_sent=True)
+        return sent
 
     @staticmethod
     def _send_booking_reminder_direct(booking) -> bool:
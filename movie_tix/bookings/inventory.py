@@ -0,0 +1,114 @@
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Seat, SeatReservation, Showtime
+from .seatmap import notify_inventory_changed
+
+logger = logging.getLogger(__name__)
+
+
+class SeatInventory:
+    """Claims and releases seats for showtimes through SeatReservation."""
+
+    @staticmethod
+    def claim_seats(booking, seats):
+        """
+        Claim all given seats for the booking's showtime in a single insert.
+
+        Either every seat is claimed or none is: a conflict on the
+        (showtime, seat) constraint rolls the whole claim back.
+        """
+        seats = list(seats)
+        reservations = [
+            SeatReservation(showtime_id=booking.showtime_id, seat=seat, booking=booking)
+            for seat in seats
+        ]
+        try:
+            with transaction.atomic():
+                SeatReservation.objects.bulk_create(reservations)
+                SeatInventory._adjust_counters(booking.showtime_id, len(reservations))
+        except IntegrityError:
+            taken = SeatInventory.get_reserved_seats(booking.showtime_id).filter(
+                id__in=[seat.id for seat in seats]
+            )
+            # No conflicting seat means the claim would have overrun the theater's capacity
+            labels = [str(seat) for seat in taken] or [str(seat) for seat in seats]
+            logger.warning(f"Seat claim conflict for booking {booking.id}: {', '.join(labels)}")
+            raise SeatUnavailableError(labels)
+
+        showtime_id = booking.showtime_id
+        seat_ids = [seat.id for seat in seats]
+        transaction.on_commit(lambda: notify_inventory_changed(showtime_id, occupied=seat_ids))
+        logger.info(f"Claimed {len(reservations)} seats for booking {booking.id}")
+        return reservations
+
+    @staticmethod
+    def release_seats(booking):
+        """Release every seat claimed by the booking. Returns the number released."""
+        with transaction.atomic():
+            reservations = SeatReservation.objects.filter(booking=booking)
+            seat_ids = list(reservations.values_list('seat_id', flat=True))
+            released, _ = reservations.delete()
+            if released:
+                SeatInventory._adjust_counters(booking.showtime_id, -released)
+        if released:
+            showtime_id = booking.showtime_id
+            transaction.on_commit(lambda: notify_inventory_changed(showtime_id, freed=seat_ids))
+            logger.info(f"Released {released} seats for booking {booking.id}")
+        return released
+
+    @staticmethod
+    def _adjust_counters(showtime_id, delta):
+        """Atomically move `delta` seats from available to booked on the showtime row"""
+        Showtime.objects.filter(pk=showtime_id).update(
+            seats_booked=F('seats_booked') + delta,
+            seats_available=F('seats_available') - delta,
+        )
+
+    @staticmethod
+    def reconcile_counters(showtimes=None, dry_run=False):
+        """
+        Recount claims for the given showtimes (all by default) and repair any
+        counter drift. Returns a list of (showtime, (booked, available)) that drifted,
+        with the recounted values.
+        """
+        if showtimes is None:
+            showtimes = Showtime.objects.all()
+        showtimes = showtimes.select_related('theater').annotate(claimed=Count('seat_reservations'))
+
+        drifted = []
+        for showtime in showtimes.iterator():
+            expected = (showtime.claimed, max(showtime.theater.total_seats - showtime.claimed, 0))
+            if (showtime.seats_booked, showtime.seats_available) == expected:
+                continue
+
+            if not dry_run:
+                # Recount under the row lock so concurrent claims can't slip in between
+                with transaction.atomic():
+                    Showtime.objects.select_for_update().filter(pk=showtime.pk).first()
+                    booked = SeatReservation.objects.filter(showtime_id=showtime.pk).count()
+                    expected = (booked, max(showtime.theater.total_seats - booked, 0))
+                    Showtime.objects.filter(pk=showtime.pk).update(
+                        seats_booked=expected[0],
+                        seats_available=expected[1],
+                    )
+            drifted.append((showtime, expected))
+        return drifted
+
+    @staticmethod
+    def get_reserved_seat_ids(showtime_id):
+        return SeatReservation.objects.filter(showtime_id=showtime_id).values_list('seat_id', flat=True)
+
+    @staticmethod
+    def get_reserved_seats(showtime_id):
+        return Seat.objects.filter(reservations__showtime_id=showtime_id).order_by('row', 'number')
+
+
+class SeatUnavailableError(Exception):
+    """Raised when one or more seats are already claimed for the showtime"""
+
+    def __init__(self, seat_labels):
+        self.seat_labels = list(seat_labels)
+        super().__init__(f"Seats no longer available: {', '.join(self.seat_labels)}")
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookings.booking_queue import BookingQueue
+
+
+class Command(BaseCommand):
+    help = "Print the Celery queues of all booking queue partitions, comma-separated (for worker -Q)"
+
+    def handle(self, *args, **options):
+        queues = [BookingQueue.queue_name(partition) for partition in range(settings.BOOKING_QUEUE_PARTITIONS)]
+        self.stdout.write(','.join(queues))
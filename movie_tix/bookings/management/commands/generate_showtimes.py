@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.scheduling import ScheduleGenerator
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = "Generate showtimes for the coming days for all active movies"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Number of days to schedule, starting today (default: 7)')
+        parser.add_argument('--movie', type=int, action='append', dest='tmdb_ids',
+                            help='Only schedule the movie with this TMDB ID (can be repeated)')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+
+        movies = None
+        if options['tmdb_ids']:
+            movies = list(Movie.objects.filter(tmdb_id__in=options['tmdb_ids']))
+            missing = set(options['tmdb_ids']) - {movie.tmdb_id for movie in movies}
+            if missing:
+                raise CommandError(f"Unknown TMDB IDs: {', '.join(map(str, sorted(missing)))}")
+
+        created = ScheduleGenerator.generate(days=options['days'], movies=movies)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} showtime(s)"))
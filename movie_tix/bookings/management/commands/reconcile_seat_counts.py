@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from bookings.inventory import SeatInventory
+from bookings.models import Showtime
+
+
+class Command(BaseCommand):
+    help = "Recount seat claims and repair drift in the Showtime seat counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--showtime', type=int, action='append', dest='showtime_ids',
+                            help='Only reconcile this showtime ID (can be repeated)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        showtimes = Showtime.objects.all()
+        if options['showtime_ids']:
+            showtimes = showtimes.filter(pk__in=options['showtime_ids'])
+
+        drifted = SeatInventory.reconcile_counters(showtimes, dry_run=options['dry_run'])
+
+        for showtime, (booked, available) in drifted:
+            self.stdout.write(
+                f"Showtime {showtime.pk}: booked {showtime.seats_booked} -> {booked}, "
+                f"available {showtime.seats_available} -> {available}"
+            )
+
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} showtime(s) with counter drift"))
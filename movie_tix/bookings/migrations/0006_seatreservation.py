@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_seat_reservations(apps, schema_editor):
+    """Create claims for the seats of existing confirmed bookings."""
+    Booking = apps.get_model('bookings', 'Booking')
+    SeatReservation = apps.get_model('bookings', 'SeatReservation')
+
+    reservations = []
+    for booking in Booking.objects.filter(status='confirmed').order_by('booking_time').prefetch_related('seats'):
+        for seat in booking.seats.all():
+            reservations.append(SeatReservation(showtime_id=booking.showtime_id, seat_id=seat.id, booking_id=booking.id))
+
+    # Earlier bookings win if legacy data double-booked a seat
+    SeatReservation.objects.bulk_create(reservations, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_alter_booking_options_alter_theater_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_reservations', to='bookings.booking')),
+                ('seat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='bookings.seat')),
+                ('showtime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_reservations', to='bookings.showtime')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('showtime', 'seat'), name='unique_showtime_seat_claim')],
+            },
+        ),
+        migrations.RunPython(backfill_seat_reservations, migrations.RunPython.noop),
+    ]
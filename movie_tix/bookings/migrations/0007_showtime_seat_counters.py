@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_seat_counters(apps, schema_editor):
+    """Initialise the counters from the existing seat claims."""
+    Showtime = apps.get_model('bookings', 'Showtime')
+
+    showtimes = Showtime.objects.select_related('theater').annotate(claimed=Count('seat_reservations'))
+    for showtime in showtimes.iterator():
+        showtime.seats_booked = showtime.claimed
+        showtime.seats_available = max(showtime.theater.total_seats - showtime.claimed, 0)
+        showtime.save(update_fields=['seats_booked', 'seats_available'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_seatreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='seats_available',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='seats_booked',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_seat_counters, migrations.RunPython.noop),
+    ]
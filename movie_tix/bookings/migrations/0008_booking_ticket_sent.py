@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_showtime_seat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='ticket_sent',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models, transaction
+from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from movies.models import Movie
@@ -69,6 +69,10 @@ class Showtime(models.Model):
     student_price = models.DecimalField(max_digits=6, decimal_places=2, default=8.00)
     is_active = models.BooleanField(default=True)
 
+    # Counter cache over SeatReservation, kept in sync by SeatInventory
+    seats_booked = models.PositiveIntegerField(default=0)
+    seats_available = models.PositiveIntegerField(default=0)
+
     class Meta:
         unique_together = ['theater', 'date', 'time']
         ordering = ['date', 'time']
@@ -76,22 +80,21 @@ class Showtime(models.Model):
     def __str__(self):
         return f"{self.movie.title} - {self.date} {self.time}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.seats_booked:
+            self.seats_available = self.theater.total_seats
+        super().save(*args, **kwargs)
+
     def get_available_seats(self):
-        """Returns the number of available (unbooked) seats"""
-        with transaction.atomic():
-            showtime = Showtime.objects.select_for_update().get(pk=self.pk)
-            booked = Seat.objects.filter(
-                bookings__showtime=showtime,
-                bookings__status='confirmed'
-            ).distinct().count()
-            return self.theater.total_seats - booked
+        """Returns the number of available (unclaimed) seats without locking or counting"""
+        return self.seats_available
 
     def is_full(self):
         return self.get_available_seats() <= 0
 
     def is_almost_full(self):
-        available = self.get_available_seats()
-        return (available / self.theater.total_seats) < 0.2
+        total = self.seats_booked + self.seats_available
+        return total > 0 and (self.seats_available / total) < 0.2
 
 
 class Seat(models.Model):
@@ -136,6 +139,7 @@ class Booking(models.Model):
     booking_reference = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     payment_id = models.CharField(max_length=100, blank=True, null=True)
     payment_method = models.CharField(max_length=20, blank=True, null=True)
+    ticket_sent = models.BooleanField(default=False)
 
     # Discount info
     student_discount_applied = models.BooleanField(default=False)
@@ -163,3 +167,24 @@ class Booking(models.Model):
         if not self.total_price:
             self.total_price = self.calculate_total_price()
         super().save(*args, **kwargs)
+
+
+class SeatReservation(models.Model):
+    """
+    A seat claimed for a specific showtime.
+
+    This table is the source of truth for occupancy: the unique constraint on
+    (showtime, seat) guarantees that a seat can only be claimed once per showtime.
+    """
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='seat_reservations')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name='reservations')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='seat_reservations')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['showtime', 'seat'], name='unique_showtime_seat_claim'),
+        ]
+
+    def __str__(self):
+        return f"{self.seat} for showtime {self.showtime_id}"
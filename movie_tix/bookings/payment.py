@@ -178,6 +178,39 @@ class PaymentService:
             logger.error(f"Error getting payment status: {str(e)}")
             return {'status': 'error', 'message': str(e)}
 
+    @staticmethod
+    def refund_payment(payment_id, reason='requested_by_customer'):
+        """Refund a payment in full. Idempotent per payment, so retrying is safe. Returns the refund ID."""
+        if not payment_id:
+            raise PaymentError("No payment ID provided")
+        try:
+            refund = stripe.Refund.create(
+                payment_intent=payment_id,
+                reason=reason,
+                idempotency_key=f"refund_{payment_id}"
+            )
+        except stripe.error.StripeError as e:
+            logger.error(f"Stripe error refunding payment {payment_id}: {str(e)}")
+            raise PaymentError(str(e))
+        logger.info(f"Refunded payment {payment_id}: {refund.id}")
+        return refund.id
+
+    @staticmethod
+    def refund_rejected_booking(booking, error):
+        """The booking was paid for but lost its seats: refund the payment and tell the customer"""
+        from .tasks import refund_rejected_booking
+        logger.warning(
+            f"Booking {booking.id} rejected after payment {booking.payment_id}: {error}; refunding"
+        )
+        try:
+            refund_rejected_booking.delay(booking.id)
+        except Exception as e:
+            logger.warning(f"Could not schedule refund for booking {booking.id} ({e}), refunding now")
+            try:
+                refund_rejected_booking(booking.id)
+            except Exception as e:
+                logger.error(f"Refund for rejected booking {booking.id} failed, needs manual follow-up: {e}")
+
 class PaymentError(Exception):
     """Custom exception for payment-related errors"""
     pass
@@ -0,0 +1,93 @@
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+
+# Modules of white space around the code, as the QR spec asks for
+QUIET_ZONE = 4
+
+MATRIX_CACHE_SIZE = 2048
+PNG_CACHE_SIZE = 256
+
+
+class TicketQR:
+    """
+    QR codes for tickets, drawn as vector rectangles.
+
+    A code is encoded once into the rectangles covering its dark modules:
+    runs of dark modules in a row become one rectangle, and identical runs in
+    consecutive rows are merged into a taller one, so a typical ticket code
+    is a few hundred rectangles in a single filled path. Encodings and PNG
+    renderings are kept in per-process LRU caches keyed by the payload (the
+    booking's signed ticket code), so the PDF and the email image of a booking
+    share one encode. Nothing here touches Django, which lets spawned pool
+    workers use it directly (see ticket_batch).
+    """
+
+    @staticmethod
+    @lru_cache(maxsize=MATRIX_CACHE_SIZE)
+    def encode(data):
+        """Return (modules per side, ((x, y, width, height), ...)) in module units, y from the top"""
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=0)
+        qr.add_data(data)
+        qr.make(fit=True)
+        return qr.modules_count, TicketQR._merge_runs(qr.modules)
+
+    @staticmethod
+    def _merge_runs(modules):
+        rects = []
+        # (start, end) of a run -> first row it appeared in, for runs still growing downwards
+        open_runs = {}
+        for y, row in enumerate(modules + [[False] * len(modules)]):
+            runs = set()
+            x = 0
+            while x < len(row):
+                if row[x]:
+                    start = x
+                    while x < len(row) and row[x]:
+                        x += 1
+                    runs.add((start, x))
+                x += 1
+            for run in list(open_runs):
+                if run not in runs:
+                    top = open_runs.pop(run)
+                    rects.append((run[0], top, run[1] - run[0], y - top))
+            for run in runs:
+                open_runs.setdefault(run, y)
+        return tuple(rects)
+
+    @staticmethod
+    def draw(p, data, x, y, size, encoded=None):
+        """Draw the code for `data` (or a precomputed encode()) into the size x size square at x, y"""
+        count, rects = encoded or TicketQR.encode(data)
+        module = size / (count + 2 * QUIET_ZONE)
+        left = x + QUIET_ZONE * module
+        top = y + size - QUIET_ZONE * module
+
+        path = p.beginPath()
+        for rx, ry, rw, rh in rects:
+            path.rect(left + rx * module, top - (ry + rh) * module, rw * module, rh * module)
+        p.saveState()
+        p.setFillColorRGB(0, 0, 0)
+        p.drawPath(path, stroke=0, fill=1)
+        p.restoreState()
+
+    @staticmethod
+    @lru_cache(maxsize=PNG_CACHE_SIZE)
+    def png(data, box_size=10):
+        """PNG bytes of the code, e.g. for an inline email image"""
+        count, rects = TicketQR.encode(data)
+        side = count + 2 * QUIET_ZONE
+        image = Image.new('1', (side, side), 1)
+        for rx, ry, rw, rh in rects:
+            image.paste(0, (QUIET_ZONE + rx, QUIET_ZONE + ry, QUIET_ZONE + rx + rw, QUIET_ZONE + ry + rh))
+        image = image.resize((side * box_size, side * box_size), Image.NEAREST)
+        buffer = BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+
+def encode_many(payloads):
+    """encode() for each payload; run by the batch renderer's pool workers"""
+    return [TicketQR.encode(data) for data in payloads]
@@ -0,0 +1,7 @@
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'^ws/showtimes/(?P<showtime_id>\d+)/seats/$', consumers.SeatMapConsumer.as_asgi()),
+]
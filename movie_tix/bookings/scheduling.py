@@ -0,0 +1,189 @@
+import datetime
+import logging
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from movies.models import Movie
+from .models import Theater, Showtime
+
+logger = logging.getLogger(__name__)
+
+# Theaters created when none of a kind exist yet
+DEFAULT_THEATERS = {
+    'standard': {
+        'name': "MovieTime Main Cinema",
+        'location': '123 Main Street',
+        'total_seats': 48,
+        'has_imax': False,
+        'has_3d': False
+    },
+    'imax': {
+        'name': "MovieTime IMAX",
+        'location': '123 Main Street',
+        'total_seats': 60,
+        'has_imax': True,
+        'has_3d': False
+    },
+    'premium': {
+        'name': "MovieTime Premium",
+        'location': '123 Main Street',
+        'total_seats': 36,
+        'has_imax': False,
+        'has_3d': True
+    },
+}
+
+# Daily showtime patterns, picked by tmdb_id % 3 for variety.
+# Weekdays use the first three slots, weekends all four.
+SHOWTIME_PATTERNS = [
+    [
+        (datetime.time(10, 30), 'standard', '10.00', '8.00'),  # Morning, standard
+        (datetime.time(14, 0), 'standard', '11.50', '9.00'),   # Afternoon, standard
+        (datetime.time(17, 30), 'imax', '15.00', '12.00'),     # Evening, IMAX
+        (datetime.time(20, 0), 'standard', '12.50', '9.50'),   # Night, standard
+    ],
+    [
+        (datetime.time(11, 15), 'premium', '12.00', '9.50'),   # Morning, 3D
+        (datetime.time(15, 45), 'standard', '11.00', '8.50'),  # Afternoon, standard
+        (datetime.time(18, 30), 'imax', '15.50', '12.50'),     # Evening, IMAX
+        (datetime.time(21, 15), 'premium', '13.00', '10.00'),  # Night, 3D
+    ],
+    [
+        (datetime.time(9, 45), 'standard', '9.50', '7.50'),    # Morning, standard
+        (datetime.time(13, 30), 'premium', '12.50', '10.00'),  # Afternoon, 3D
+        (datetime.time(16, 45), 'standard', '11.50', '9.00'),  # Evening, standard
+        (datetime.time(19, 45), 'imax', '16.00', '13.00'),     # Night, IMAX
+    ],
+]
+
+
+class ScheduleGenerator:
+    """
+    Builds showtimes for upcoming days in bulk.
+
+    Runs from the generate_showtimes command and the daily Celery task so
+    request handlers never write schedule data. Slots are handed to free
+    theaters up front, so once movies outnumber theaters the overflow is
+    skipped and logged rather than lost to a conflict. Inserts still go
+    through bulk_create(ignore_conflicts=True) against the (theater, date,
+    time) unique constraint, which keeps concurrent runs harmless.
+    """
+
+    @staticmethod
+    def get_theaters_by_kind():
+        """Group theaters by the kind of slot they serve, creating the defaults when a kind is missing"""
+        theaters = {kind: [] for kind in DEFAULT_THEATERS}
+        for theater in Theater.objects.order_by('id'):
+            theaters[ScheduleGenerator._theater_kind(theater)].append(theater)
+
+        for kind, defaults in DEFAULT_THEATERS.items():
+            if not theaters[kind]:
+                theater, _ = Theater.objects.get_or_create(name=defaults['name'], defaults=defaults)
+                theaters[kind].append(theater)
+        return theaters
+
+    @staticmethod
+    def _theater_kind(theater):
+        if theater.has_imax:
+            return 'imax'
+        if theater.has_3d:
+            return 'premium'
+        return 'standard'
+
+    @staticmethod
+    def get_active_movies(end_date):
+        """Movies already released (or with no known date) by the end of the schedule window"""
+        return Movie.objects.filter(Q(release_date__isnull=True) | Q(release_date__lte=end_date)).order_by('id')
+
+    @staticmethod
+    def get_used_slots(dates):
+        """
+        Slots already scheduled in the window, as two sets: (theater_id, date, time)
+        for occupied screens and (movie_id, date, time) for movies already showing.
+        """
+        rows = Showtime.objects.filter(date__gte=dates[0], date__lte=dates[-1]).values_list(
+            'theater_id', 'movie_id', 'date', 'time'
+        )
+        theater_slots, movie_slots = set(), set()
+        for theater_id, movie_id, date, time in rows:
+            theater_slots.add((theater_id, date, time))
+            movie_slots.add((movie_id, date, time))
+        return theater_slots, movie_slots
+
+    @staticmethod
+    def build_showtimes(movie, dates, theaters_by_kind, theater_slots, movie_slots, offset=0):
+        """
+        Unsaved Showtime objects for one movie, plus the number of slots skipped.
+
+        Each slot goes to the first theater of its kind that is free at that
+        date and time, starting at `offset` so movies spread over theaters.
+        `theater_slots` and `movie_slots` (see get_used_slots) are updated as
+        slots are handed out; a slot with no free theater is skipped.
+        """
+        pattern = SHOWTIME_PATTERNS[movie.tmdb_id % len(SHOWTIME_PATTERNS)]
+        showtimes = []
+        skipped = 0
+        for date in dates:
+            # Weekends (Saturday and Sunday) get every slot
+            day_slots = pattern if date.weekday() >= 5 else pattern[:3]
+            for time, kind, price, student_price in day_slots:
+                if (movie.id, date, time) in movie_slots:
+                    continue  # Scheduled by an earlier run
+
+                theaters = theaters_by_kind[kind]
+                candidates = (theaters[(offset + i) % len(theaters)] for i in range(len(theaters)))
+                theater = next((t for t in candidates if (t.id, date, time) not in theater_slots), None)
+                if theater is None:
+                    skipped += 1
+                    continue
+
+                theater_slots.add((theater.id, date, time))
+                movie_slots.add((movie.id, date, time))
+                showtimes.append(Showtime(
+                    movie=movie,
+                    theater=theater,
+                    date=date,
+                    time=time,
+                    price=Decimal(price),
+                    student_price=Decimal(student_price),
+                    # bulk_create skips Showtime.save, so seed the seat counter here
+                    seats_available=theater.total_seats,
+                ))
+        return showtimes, skipped
+
+    @staticmethod
+    def generate(days=7, movies=None, start_date=None):
+        """Create missing showtimes for the next `days` days. Returns the number created."""
+        start_date = start_date or timezone.now().date()
+        dates = [start_date + datetime.timedelta(days=i) for i in range(days)]
+        if movies is None:
+            movies = ScheduleGenerator.get_active_movies(dates[-1])
+
+        theaters_by_kind = ScheduleGenerator.get_theaters_by_kind()
+        theater_slots, movie_slots = ScheduleGenerator.get_used_slots(dates)
+        showtimes = []
+        skipped = 0
+        for offset, movie in enumerate(movies):
+            movie_showtimes, movie_skipped = ScheduleGenerator.build_showtimes(
+                movie, dates, theaters_by_kind, theater_slots, movie_slots, offset
+            )
+            showtimes.extend(movie_showtimes)
+            skipped += movie_skipped
+            if movie_skipped:
+                logger.warning(f"No free theater for {movie_skipped} slot(s) of movie {movie.id} ({movie.title})")
+
+        window = Showtime.objects.filter(date__gte=dates[0], date__lte=dates[-1])
+        before = window.count()
+        Showtime.objects.bulk_create(showtimes, batch_size=500, ignore_conflicts=True)
+        created = window.count() - before
+
+        if created < len(showtimes):
+            # Only a concurrent run claiming the same slots can get here
+            logger.warning(f"{len(showtimes) - created} showtime(s) were taken by a concurrent run")
+        logger.info(
+            f"Generated {created} showtimes for {dates[0]}..{dates[-1]} "
+            f"({len(showtimes)} candidates, {skipped} slot(s) skipped for lack of a free theater)"
+        )
+        return created
@@ -0,0 +1,73 @@
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows slightly behind the middle of the room are the most sought after
+IDEAL_ROW_POSITION = 0.6
+ROW_WEIGHT = 2.0
+
+
+class BestAvailableFinder:
+    """
+    Finds the best contiguous blocks of free seats in a seat map.
+
+    Works directly on the SeatMapService layout and occupancy bitset: every
+    row becomes an integer mask and candidate blocks are tested with a single
+    AND each, so even large rooms are searched in well under a millisecond.
+    Column `c` of a row is seat number `c + 1`; holes in the layout (seats
+    a row doesn't have) count as taken, so blocks never span a gap.
+    Lower scores are better: distance from the ideal row, weighted by
+    ROW_WEIGHT, plus the block's distance from the centre of its row.
+    """
+
+    def __init__(self, layout, occupancy):
+        self.rows = layout['rows']
+        self.columns = layout['columns']
+        self.seat_ids = layout['seat_ids']
+        self.row_masks = self._row_masks(occupancy)
+
+    def _row_masks(self, occupancy):
+        """One integer per row with bit `column` set where that seat is taken or doesn't exist"""
+        masks = []
+        for row_index in range(len(self.rows)):
+            mask = 0
+            for column in range(self.columns):
+                index = row_index * self.columns + column
+                missing = index >= len(self.seat_ids) or self.seat_ids[index] is None
+                if missing or occupancy[index >> 3] & (0x80 >> (index & 7)):
+                    mask |= 1 << column
+            masks.append(mask)
+        return masks
+
+    def _score(self, row_index, start, count):
+        row_count = len(self.rows)
+        ideal_row = (row_count - 1) * IDEAL_ROW_POSITION
+        row_score = abs(row_index - ideal_row) / max(row_count, 1)
+        block_centre = start + (count - 1) / 2
+        row_centre = (self.columns - 1) / 2
+        centre_score = abs(block_centre - row_centre) / max(self.columns, 1)
+        return ROW_WEIGHT * row_score + centre_score
+
+    def find(self, count, top_k=3):
+        """Return up to `top_k` blocks of `count` adjacent free seats, best first"""
+        if count < 1 or count > self.columns:
+            return []
+
+        window = (1 << count) - 1
+        candidates = []
+        for row_index, mask in enumerate(self.row_masks):
+            for start in range(self.columns - count + 1):
+                if mask & (window << start) == 0:
+                    candidates.append((self._score(row_index, start, count), row_index, start))
+
+        blocks = []
+        for score, row_index, start in heapq.nsmallest(top_k, candidates):
+            first = row_index * self.columns + start
+            blocks.append({
+                'row': self.rows[row_index],
+                'numbers': list(range(start + 1, start + count + 1)),
+                'seat_ids': self.seat_ids[first:first + count],
+                'score': round(score, 4),
+            })
+        return blocks
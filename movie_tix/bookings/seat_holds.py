@@ -0,0 +1,306 @@
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+
+from movie_tix.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# All keys of one showtime share the {showtime_id} hash tag so the scripts
+# below stay valid on a Redis Cluster.
+KEY_PREFIX = 'seathold'
+SHOWTIMES_KEY = f'{KEY_PREFIX}:showtimes'
+
+# KEYS: index, token hash, seat keys...
+# ARGV: token, ttl_ms, expires_at_ms, owner_id, seat ids...
+HOLD_SCRIPT = """
+local conflicts = {}
+for i = 3, #KEYS do
+    local owner = redis.call('GET', KEYS[i])
+    if owner and owner ~= ARGV[1] then
+        table.insert(conflicts, ARGV[i + 2])
+    end
+end
+if #conflicts > 0 then
+    return conflicts
+end
+local seats = {}
+for i = 3, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[1], 'PX', ARGV[2])
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[i + 2])
+    table.insert(seats, ARGV[i + 2])
+end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[2], 'owner', ARGV[4], 'seats', table.concat(seats, ','), 'expires_at', ARGV[3])
+redis.call('PEXPIRE', KEYS[2], ARGV[2])
+return conflicts
+"""
+
+# Seats are read from the token hash before EXTEND and RELEASE run so that every
+# seat key can be passed in KEYS; the scripts check the hash still lists exactly
+# those seats. Token hashes are never rewritten with other seats, so a mismatch
+# only means the hold is gone.
+
+# KEYS: index, token hash, seat keys...
+# ARGV: token, ttl_ms, expires_at_ms, owner_id, seat ids...
+EXTEND_SCRIPT = """
+local hold = redis.call('HMGET', KEYS[2], 'owner', 'seats')
+if not hold[1] or hold[1] ~= ARGV[4] or hold[2] ~= table.concat(ARGV, ',', 5) then
+    return 0
+end
+for i = 3, #KEYS do
+    if redis.call('GET', KEYS[i]) ~= ARGV[1] then
+        return 0
+    end
+end
+for i = 3, #KEYS do
+    redis.call('PEXPIRE', KEYS[i], ARGV[2])
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[i + 2])
+end
+redis.call('HSET', KEYS[2], 'expires_at', ARGV[3])
+redis.call('PEXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: index, token hash, seat keys...
+# ARGV: token, owner_id (empty to skip the check), seat ids...
+RELEASE_SCRIPT = """
+local hold = redis.call('HMGET', KEYS[2], 'owner', 'seats')
+if not hold[1] or (ARGV[2] ~= '' and hold[1] ~= ARGV[2]) or hold[2] ~= table.concat(ARGV, ',', 3) then
+    return {}
+end
+local released = {}
+for i = 3, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        table.insert(released, ARGV[i])
+    end
+end
+redis.call('DEL', KEYS[2])
+return released
+"""
+
+# KEYS: index, seat keys of the index entries due to expire...
+# ARGV: now_ms, seat ids...
+SWEEP_SCRIPT = """
+local expired = {}
+for i = 2, #KEYS do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) <= tonumber(ARGV[1]) and redis.call('EXISTS', KEYS[i]) == 0 then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        table.insert(expired, ARGV[i])
+    end
+end
+return {expired, redis.call('ZCARD', KEYS[1])}
+"""
+
+
+@dataclass
+class SeatHold:
+    token: str
+    showtime_id: int
+    seat_ids: list
+    expires_at: datetime
+
+    def to_dict(self):
+        return {
+            'hold_token': self.token,
+            'showtime_id': self.showtime_id,
+            'seat_ids': self.seat_ids,
+            'expires_at': self.expires_at.isoformat(),
+        }
+
+
+class SeatHoldService:
+    """
+    Time-limited seat holds in Redis.
+
+    A hold claims every requested seat with one atomic multi-key SET-if-absent,
+    so two users can never hold the same seat. Each seat key expires on its own;
+    the sweeper then clears the per-showtime index and reports which seats
+    went back to availability.
+    """
+
+    @staticmethod
+    def _index_key(showtime_id):
+        return f'{KEY_PREFIX}:{{{showtime_id}}}:index'
+
+    @staticmethod
+    def _token_key(showtime_id, token):
+        return f'{KEY_PREFIX}:{{{showtime_id}}}:token:{token}'
+
+    @staticmethod
+    def _seat_prefix(showtime_id):
+        return f'{KEY_PREFIX}:{{{showtime_id}}}:seat:'
+
+    @staticmethod
+    def _expiry(ttl):
+        ttl = ttl or settings.SEAT_HOLD_TTL
+        expires_at_ms = int(time.time() * 1000) + ttl * 1000
+        return ttl * 1000, expires_at_ms
+
+    @staticmethod
+    def _run(script, keys, args):
+        try:
+            return get_redis_client().eval(script, len(keys), *keys, *args)
+        except redis.RedisError as e:
+            logger.error(f"Seat hold backend error: {e}")
+            raise SeatHoldError("Seat holds are temporarily unavailable") from e
+
+    @staticmethod
+    def hold(showtime_id, seat_ids, owner_id, ttl=None):
+        """Hold all seats for `owner_id`, or none of them. Raises SeatHoldConflictError."""
+        seat_ids = sorted({int(seat_id) for seat_id in seat_ids})
+        if not seat_ids:
+            raise SeatHoldError("No seats to hold")
+
+        token = uuid.uuid4().hex
+        ttl_ms, expires_at_ms = SeatHoldService._expiry(ttl)
+        keys = [SeatHoldService._index_key(showtime_id), SeatHoldService._token_key(showtime_id, token)]
+        keys += SeatHoldService._seat_keys(showtime_id, seat_ids)
+
+        conflicts = SeatHoldService._run(HOLD_SCRIPT, keys, [token, ttl_ms, expires_at_ms, owner_id, *seat_ids])
+        if conflicts:
+            raise SeatHoldConflictError([int(seat_id) for seat_id in conflicts])
+
+        try:
+            get_redis_client().sadd(SHOWTIMES_KEY, showtime_id)
+        except redis.RedisError as e:
+            logger.warning(f"Could not register showtime {showtime_id} for hold sweeping: {e}")
+
+        _notify_inventory_changed(showtime_id, occupied=seat_ids)
+        logger.info(f"Held seats {seat_ids} for showtime {showtime_id} (hold {token})")
+        return SeatHold(token, int(showtime_id), seat_ids, _from_ms(expires_at_ms))
+
+    @staticmethod
+    def _held_seats(showtime_id, token):
+        """Seat IDs recorded on a hold's token hash (as stored), or [] if it has expired"""
+        try:
+            seats = get_redis_client().hget(SeatHoldService._token_key(showtime_id, token), 'seats')
+        except redis.RedisError as e:
+            logger.error(f"Seat hold backend error: {e}")
+            raise SeatHoldError("Seat holds are temporarily unavailable") from e
+        return seats.split(',') if seats else []
+
+    @staticmethod
+    def _seat_keys(showtime_id, seat_ids):
+        seat_prefix = SeatHoldService._seat_prefix(showtime_id)
+        return [f'{seat_prefix}{seat_id}' for seat_id in seat_ids]
+
+    @staticmethod
+    def extend(showtime_id, token, owner_id, ttl=None):
+        """Push the expiry of a live hold forward. Raises SeatHoldExpiredError."""
+        seats = SeatHoldService._held_seats(showtime_id, token)
+        ttl_ms, expires_at_ms = SeatHoldService._expiry(ttl)
+        keys = [SeatHoldService._index_key(showtime_id), SeatHoldService._token_key(showtime_id, token)]
+        keys += SeatHoldService._seat_keys(showtime_id, seats)
+        if not seats or not SeatHoldService._run(EXTEND_SCRIPT, keys, [token, ttl_ms, expires_at_ms, owner_id, *seats]):
+            raise SeatHoldExpiredError("Seat hold has expired or does not exist")
+        return _from_ms(expires_at_ms)
+
+    @staticmethod
+    def release(showtime_id, token, owner_id=None):
+        """Release a hold early. Returns the seat IDs that were released."""
+        seats = SeatHoldService._held_seats(showtime_id, token)
+        if not seats:
+            return []
+        keys = [SeatHoldService._index_key(showtime_id), SeatHoldService._token_key(showtime_id, token)]
+        keys += SeatHoldService._seat_keys(showtime_id, seats)
+        owner = '' if owner_id is None else owner_id
+        released = SeatHoldService._run(RELEASE_SCRIPT, keys, [token, owner, *seats])
+        released = [int(seat_id) for seat_id in released]
+        if released:
+            _notify_inventory_changed(showtime_id, freed=released)
+        return released
+
+    @staticmethod
+    def get_hold(showtime_id, token):
+        """Return the live SeatHold for a token, or None if it has expired"""
+        try:
+            data = get_redis_client().hgetall(SeatHoldService._token_key(showtime_id, token))
+        except redis.RedisError as e:
+            raise SeatHoldError("Seat holds are temporarily unavailable") from e
+        if not data:
+            return None
+        seat_ids = [int(seat_id) for seat_id in data['seats'].split(',')]
+        return SeatHold(token, int(showtime_id), seat_ids, _from_ms(int(data['expires_at'])))
+
+    @staticmethod
+    def verify(showtime_id, token, seat_ids, owner_id):
+        """True if `token` still holds exactly these seats for this owner"""
+        client = get_redis_client()
+        try:
+            owner = client.hget(SeatHoldService._token_key(showtime_id, token), 'owner')
+            if owner != str(owner_id):
+                return False
+            seat_prefix = SeatHoldService._seat_prefix(showtime_id)
+            holders = client.mget([f'{seat_prefix}{int(seat_id)}' for seat_id in seat_ids])
+        except redis.RedisError as e:
+            raise SeatHoldError("Seat holds are temporarily unavailable") from e
+        return bool(seat_ids) and all(holder == token for holder in holders)
+
+    @staticmethod
+    def get_held_seat_ids(showtime_id):
+        """Seat IDs currently held (not yet expired) for the showtime"""
+        now_ms = int(time.time() * 1000)
+        try:
+            seat_ids = get_redis_client().zrangebyscore(SeatHoldService._index_key(showtime_id), now_ms, '+inf')
+        except redis.RedisError as e:
+            logger.warning(f"Could not read seat holds for showtime {showtime_id}: {e}")
+            return set()
+        return {int(seat_id) for seat_id in seat_ids}
+
+    @staticmethod
+    def sweep_expired():
+        """
+        Clear expired holds from every showtime index.
+        Returns {showtime_id: [seat_id, ...]} for the seats that became available again.
+        """
+        client = get_redis_client()
+        now_ms = int(time.time() * 1000)
+        released = {}
+        for showtime_id in client.smembers(SHOWTIMES_KEY):
+            index_key = SeatHoldService._index_key(showtime_id)
+            due = client.zrangebyscore(index_key, '-inf', now_ms)
+            keys = [index_key, *SeatHoldService._seat_keys(showtime_id, due)]
+            expired, remaining = client.eval(SWEEP_SCRIPT, len(keys), *keys, now_ms, *due)
+            if expired:
+                released[int(showtime_id)] = [int(seat_id) for seat_id in expired]
+                _notify_inventory_changed(int(showtime_id), freed=released[int(showtime_id)])
+            if not remaining:
+                client.srem(SHOWTIMES_KEY, showtime_id)
+        return released
+
+
+def _notify_inventory_changed(showtime_id, occupied=(), freed=()):
+    # Imported here because the seat map reads holds from this module
+    from .seatmap import notify_inventory_changed
+    notify_inventory_changed(showtime_id, occupied=occupied, freed=freed)
+
+
+def _from_ms(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=dt_timezone.utc)
+
+
+class SeatHoldError(Exception):
+    """Base exception for seat hold errors"""
+    pass
+
+
+class SeatHoldConflictError(SeatHoldError):
+    """Raised when some of the requested seats are held by someone else"""
+
+    def __init__(self, seat_ids):
+        self.seat_ids = list(seat_ids)
+        super().__init__(f"Seats already held: {', '.join(str(seat_id) for seat_id in self.seat_ids)}")
+
+
+class SeatHoldExpiredError(SeatHoldError):
+    """Raised when a hold has expired or belongs to another user"""
+    pass
@@ -0,0 +1,196 @@
+import base64
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.http import parse_etags
+
+from .models import Seat, SeatReservation, Showtime
+from .seat_holds import SeatHoldService
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_CACHE_TIMEOUT = 60 * 60 * 24
+SEATMAP_CACHE_TIMEOUT = 60 * 5
+# Bump when the layout's shape changes so cached layouts and seat maps are rebuilt
+LAYOUT_VERSION = 2
+# Versions reseed above anything handed out before, so they can expire; this keeps keys
+# for showtimes that are gone (or never existed) from piling up in the cache
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+class SeatMapService:
+    """
+    Compact seat maps: a static layout per theater plus an occupancy bitset per showtime.
+
+    Every claim, release or hold bumps a per-showtime inventory version kept in
+    the cache. Seat maps are cached under that version, so an unchanged map
+    can be revalidated from the version alone without touching the database.
+
+    The layout lists seat IDs as a row-major `rows` x `columns` grid, with
+    null where a row has no seat at that number; bit `i` of the occupancy
+    bitset (most significant bit first) is set when seat `i` is claimed or
+    held. A client can render the map with one pass over the bitset.
+    """
+
+    @staticmethod
+    def _layout_key(theater):
+        return f'seatmap:layout:v{LAYOUT_VERSION}:{theater.id}:{theater.total_seats}'
+
+    @staticmethod
+    def _seatmap_key(showtime_id, version):
+        return f'seatmap:showtime:{showtime_id}:l{LAYOUT_VERSION}:v{version}'
+
+    @staticmethod
+    def _version_key(showtime_id):
+        return f'seatmap:version:{showtime_id}'
+
+    @staticmethod
+    def get_layout(theater):
+        """Static layout descriptor for a theater, cached until its seat count changes"""
+        key = SeatMapService._layout_key(theater)
+        layout = cache.get(key)
+        if layout is None:
+            layout = SeatMapService._build_layout(theater)
+            cache.set(key, layout, LAYOUT_CACHE_TIMEOUT)
+        return layout
+
+    @staticmethod
+    def _build_layout(theater):
+        rows = list(Seat.objects.order_by('row').values_list('row', flat=True).distinct())
+        max_number = Seat.objects.aggregate(max_number=Max('number'))['max_number'] or 0
+        columns = min(theater.total_seats // len(rows), max_number) if rows else 0
+
+        # Place every seat by its own row and number, so a row with gaps leaves holes instead of shifting
+        row_index = {row: index for index, row in enumerate(rows)}
+        seat_ids = [None] * (len(rows) * columns)
+        for seat_id, row, number in Seat.objects.filter(row__in=rows, number__lte=columns).values_list(
+            'id', 'row', 'number'
+        ):
+            seat_ids[row_index[row] * columns + number - 1] = seat_id
+        return {
+            'theater_id': theater.id,
+            'rows': rows,
+            'columns': columns,
+            'seat_ids': seat_ids,
+        }
+
+    @staticmethod
+    def encode_occupancy(layout, occupied_seat_ids):
+        """Pack occupancy into a bitset aligned with layout['seat_ids']"""
+        bits = bytearray((len(layout['seat_ids']) + 7) // 8)
+        for index, seat_id in enumerate(layout['seat_ids']):
+            if seat_id in occupied_seat_ids:
+                bits[index >> 3] |= 0x80 >> (index & 7)
+        return bytes(bits)
+
+    @staticmethod
+    def get_occupied_seat_ids(showtime_id):
+        """Seats that can't be selected: claimed by a booking or currently held"""
+        claimed = set(SeatReservation.objects.filter(showtime_id=showtime_id).values_list('seat_id', flat=True))
+        return claimed | SeatHoldService.get_held_seat_ids(showtime_id)
+
+    @staticmethod
+    def get_version(showtime_id):
+        """Current inventory version of a showtime; reads only the cache"""
+        key = SeatMapService._version_key(showtime_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), VERSION_TIMEOUT)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def bump_version(showtime_id):
+        """Advance the inventory version so cached seat maps and ETags go stale"""
+        key = SeatMapService._version_key(showtime_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Evicted or never set: reseed above any version handed out before
+            cache.add(key, _initial_version(), VERSION_TIMEOUT)
+            return cache.incr(key)
+
+    @staticmethod
+    def get_etag(showtime_id, version, with_layout=True):
+        return f'"seatmap-{showtime_id}-{version}{"" if with_layout else "-nolayout"}"'
+
+    @staticmethod
+    def parse_if_none_match(header):
+        """Entity tags of an If-None-Match header for weak comparison (W/ prefixes dropped); '*' is kept"""
+        return {tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(header or '')}
+
+    @staticmethod
+    def get_seat_map(showtime_id, version=None):
+        """
+        Seat map payload for a showtime at the given inventory version (current
+        by default), or None if the showtime doesn't exist.
+        """
+        # Read the version before the inventory so a cached map is never older than its version
+        if version is None:
+            version = SeatMapService.get_version(showtime_id)
+        key = SeatMapService._seatmap_key(showtime_id, version)
+        seat_map = cache.get(key)
+        if seat_map is not None:
+            return seat_map
+
+        try:
+            showtime = Showtime.objects.select_related('theater').get(pk=showtime_id)
+        except Showtime.DoesNotExist:
+            return None
+
+        layout = SeatMapService.get_layout(showtime.theater)
+        occupancy = SeatMapService.encode_occupancy(layout, SeatMapService.get_occupied_seat_ids(showtime.id))
+        seat_map = {
+            'showtime_id': showtime.id,
+            'version': version,
+            'price': float(showtime.price),
+            'student_price': float(showtime.student_price),
+            'layout': layout,
+            'occupancy': base64.b64encode(occupancy).decode('ascii'),
+        }
+        cache.set(key, seat_map, SEATMAP_CACHE_TIMEOUT)
+        return seat_map
+
+
+def _initial_version():
+    # Microsecond clock: a reseeded counter starts above any version a client may still hold
+    return time.time_ns() // 1000
+
+
+def seatmap_group_name(showtime_id):
+    return f'seatmap.showtime.{showtime_id}'
+
+
+def broadcast_seat_changes(showtime_id, version, occupied=(), freed=()):
+    """Fan a seat delta out to every socket watching the showtime (see SeatMapConsumer)"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(seatmap_group_name(showtime_id), {
+            'type': 'seats.changed',
+            'showtime_id': showtime_id,
+            'version': version,
+            'occupied': sorted(occupied),
+            'freed': sorted(freed),
+        })
+    except Exception as e:
+        # Clients fall back to polling the seat map; never fail a booking over a push
+        logger.warning(f"Failed to broadcast seat changes for showtime {showtime_id}: {e}")
+
+
+def notify_inventory_changed(showtime_id, occupied=(), freed=()):
+    """
+    Called whenever seats of a showtime are claimed, released, held or freed.
+    Bumps the inventory version and pushes the delta to live seat maps.
+    """
+    version = SeatMapService.bump_version(showtime_id)
+    freed = set(freed)
+    if freed:
+        # A released hold may have just turned into a claim; only announce seats that are really free
+        freed -= SeatMapService.get_occupied_seat_ids(showtime_id)
+    broadcast_seat_changes(showtime_id, version, occupied=set(occupied), freed=freed)
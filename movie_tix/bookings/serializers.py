@@ -30,7 +30,8 @@ class ShowtimeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Showtime
         fields = ['id', 'movie', 'movie_title', 'theater', 'date', 'time', 
-                 'price', 'student_price', 'is_active']
+                 'price', 'student_price', 'is_active', 'seats_booked', 'seats_available']
+        read_only_fields = ['seats_booked', 'seats_available']
 
 class BookingSerializer(serializers.ModelSerializer):
     """
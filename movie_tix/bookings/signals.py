@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
@@ -7,6 +7,8 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from .models import Booking
 from .email_service import EmailService
+from .inventory import SeatInventory
+from .ticket_store import TicketStore
 
 @receiver(post_save, sender=Booking)
 def send_booking_confirmation(sender, instance, created, **kwargs):
@@ -14,6 +16,32 @@ def send_booking_confirmation(sender, instance, created, **kwargs):
     if created and instance.status == 'confirmed':
         EmailService.send_booking_confirmation(instance)
 
+@receiver(post_save, sender=Booking)
+def release_cancelled_booking_seats(sender, instance, created, **kwargs):
+    """Return the seats of a cancelled booking to the showtime's inventory"""
+    if instance.status == 'cancelled':
+        SeatInventory.release_seats(instance)
+
+@receiver(pre_delete, sender=Booking)
+def release_deleted_booking_seats(sender, instance, **kwargs):
+    """Give the seats back before the delete cascades the claims away behind the counters' back"""
+    SeatInventory.release_seats(instance)
+
+@receiver(post_save, sender=Booking)
+def prune_stale_tickets(sender, instance, created, **kwargs):
+    """Drop stored ticket PDFs that no longer match the booking"""
+    if not created:
+        TicketStore.invalidate(instance)
+
+@receiver(m2m_changed, sender=Booking.seats.through)
+def prune_tickets_on_seat_change(sender, instance, action, reverse, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        TicketStore.invalidate(instance)
+
+@receiver(post_delete, sender=Booking)
+def delete_booking_tickets(sender, instance, **kwargs):
+    TicketStore.invalidate(instance, keep_current=False)
+
 def send_booking_reminders():
     """
     Send reminder emails for bookings scheduled for tomorrow.
@@ -3,7 +3,12 @@ from django.conf import settings
 from django.template.loader import render_to_string
 from django.core.mail import EmailMultiAlternatives
 from bookings.models import Booking
-from bookings.ticket_generator import TicketGenerator
+from movies.models import Movie
+from bookings.booking_queue import BookingQueue
+from bookings.payment import PaymentService, PaymentError
+from bookings.scheduling import ScheduleGenerator
+from bookings.seat_holds import SeatHoldService
+from bookings.ticket_store import TicketStore
 from botocore.exceptions import ClientError
 import boto3
 import logging
@@ -33,6 +38,43 @@ def send_booking_reminder_email(booking_id):
     return _send_email(booking_id, email_type='reminder')
 
 
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def refund_rejected_booking(self, booking_id):
+    """Refund a paid booking whose queued seat claim was rejected, then email the customer"""
+    booking = Booking.objects.get(id=booking_id)
+    if booking.payment_id and 'Refunded (' not in booking.notes:
+        try:
+            refund_id = PaymentService.refund_payment(booking.payment_id)
+        except PaymentError as e:
+            raise self.retry(exc=e)
+        booking.notes = f"{booking.notes}\nRefunded ({refund_id})".strip()
+        # update() rather than save(): nothing else about the booking changed
+        Booking.objects.filter(id=booking.id).update(notes=booking.notes)
+    return _send_email(booking_id, email_type='rejection')
+
+
+@shared_task
+def sweep_expired_seat_holds():
+    """Return seats from expired holds to availability"""
+    released = SeatHoldService.sweep_expired()
+    for showtime_id, seat_ids in released.items():
+        logger.info(f"Released {len(seat_ids)} expired seat holds for showtime {showtime_id}")
+    return sum(len(seat_ids) for seat_ids in released.values())
+
+
+@shared_task
+def generate_showtimes(days=7, movie_ids=None):
+    """Build missing showtimes for the coming days (all active movies by default)"""
+    movies = Movie.objects.filter(id__in=movie_ids) if movie_ids else None
+    return ScheduleGenerator.generate(days=days, movies=movies)
+
+
+@shared_task
+def process_booking_queue(partition):
+    """Drain one booking queue partition; routed to the partition's own Celery queue"""
+    return BookingQueue.drain(partition)
+
+
 def _send_email(booking_id, email_type):
     try:
         booking = Booking.objects.select_related('user', 'showtime__movie', 'showtime__theater').get(id=booking_id)
@@ -46,14 +88,19 @@ def _send_email(booking_id, email_type):
 
     attachments = []
     if email_type == 'confirmation':
-        pdf_bytes = TicketGenerator.generate_ticket_pdf(booking)
+        pdf_bytes = TicketStore.get_pdf(booking)
         attachments.append(('ticket.pdf', pdf_bytes, 'application/pdf'))
 
     try:
-        return _send_email_with_ses(subject, recipient_email, text_body, html_body, attachments)
+        result = _send_email_with_ses(subject, recipient_email, text_body, html_body, attachments)
     except ClientError as e:
         logger.warning(f"SES failed: {e}, falling back to Django backend.")
-        return _send_email_with_django(subject, recipient_email, text_body, html_body, attachments)
+        result = _send_email_with_django(subject, recipient_email, text_body, html_body, attachments)
+
+    if email_type == 'confirmation':
+        # update() rather than save(): nothing printed on the ticket changed
+        Booking.objects.filter(id=booking.id).update(ticket_sent=True)
+    return result
 
 
 def _get_recipient_email(booking):
@@ -83,6 +130,10 @@ def _render_email_content(booking, email_type):
         subject = f"Reminder: Your Movie - {booking.showtime.movie.title}"
         text_template = 'bookings/email/booking_reminder.txt'
         html_template = 'bookings/email/booking_reminder.html'
+    elif email_type == 'rejection':
+        subject = f"Booking Not Completed - {booking.showtime.movie.title}"
+        text_template = 'bookings/email/booking_rejected.txt'
+        html_template = 'bookings/email/booking_rejected.html'
     else:
         raise ValueError("Invalid email type")
 
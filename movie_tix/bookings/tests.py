@@ -0,0 +1,467 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+from unittest import mock
+
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from movies.models import Movie
+from .booking_queue import BookingQueue
+from .inventory import SeatInventory
+from .models import Booking, Seat, SeatReservation, Showtime, Theater
+from .payment import PaymentService
+from .seat_finder import BestAvailableFinder
+from .seat_holds import SeatHoldConflictError, SeatHoldError, SeatHoldExpiredError, SeatHoldService
+from .seatmap import SeatMapService
+from .ticket_codes import MAC_BYTES, V1_HEADER, ExpiredTicketCodeError, InvalidTicketCodeError, TicketCode
+
+
+class RedisTestMixin:
+    """Point the shared Redis client at fakeredis, or at a scratch database of a reachable Redis"""
+
+    def setUp(self):
+        super().setUp()
+        try:
+            import fakeredis
+            client = fakeredis.FakeRedis(decode_responses=True)
+        except ImportError:
+            client = redis.Redis.from_url(settings.REDIS_URL, db=15, decode_responses=True, socket_connect_timeout=1)
+            try:
+                client.ping()
+            except redis.RedisError:
+                self.skipTest("Needs fakeredis or a reachable Redis")
+        client.flushdb()
+        self.redis = client
+        patcher = mock.patch('movie_tix.redis_client._client', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(client.flushdb)
+
+
+class BookingDeleteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('moviegoer', password='x')
+        movie = Movie.objects.create(tmdb_id=550, title='Fight Club')
+        theater = Theater.objects.create(name='Screen 1', location='Downtown', total_seats=48)
+        self.showtime = Showtime.objects.create(
+            movie=movie, theater=theater, date=datetime.date(2030, 1, 1), time=datetime.time(20, 0)
+        )
+        self.seats = [Seat.objects.create(row='A', number=number) for number in (1, 2, 3)]
+
+    def _confirmed_booking(self):
+        booking = Booking.objects.create(
+            user=self.user, showtime=self.showtime, total_price=Decimal('30.00'), status='confirmed'
+        )
+        booking.seats.set(self.seats)
+        SeatInventory.claim_seats(booking, self.seats)
+        return booking
+
+    def test_deleting_confirmed_booking_returns_seats_to_counters(self):
+        booking = self._confirmed_booking()
+        self.showtime.refresh_from_db()
+        self.assertEqual((self.showtime.seats_booked, self.showtime.seats_available), (3, 45))
+
+        booking.delete()
+
+        self.showtime.refresh_from_db()
+        self.assertEqual(SeatReservation.objects.filter(showtime=self.showtime).count(), 0)
+        self.assertEqual((self.showtime.seats_booked, self.showtime.seats_available), (0, 48))
+
+    def test_queryset_delete_returns_seats_to_counters(self):
+        self._confirmed_booking()
+
+        Booking.objects.filter(showtime=self.showtime).delete()
+
+        self.showtime.refresh_from_db()
+        self.assertEqual((self.showtime.seats_booked, self.showtime.seats_available), (0, 48))
+
+
+@mock.patch('bookings.tasks.refund_rejected_booking.delay')
+@mock.patch('bookings.email_service.EmailService.send_booking_confirmation')
+class PaymentSeatConflictTests(TestCase):
+    """A payment whose seats were claimed by someone else in the meantime is refunded"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('moviegoer', password='x')
+        self.rival = User.objects.create_user('rival', password='x')
+        movie = Movie.objects.create(tmdb_id=550, title='Fight Club')
+        theater = Theater.objects.create(name='Screen 1', location='Downtown', total_seats=48)
+        self.showtime = Showtime.objects.create(
+            movie=movie, theater=theater, date=datetime.date(2030, 1, 1), time=datetime.time(20, 0),
+            price=Decimal('10.00'), student_price=Decimal('8.00')
+        )
+        self.seats = [Seat.objects.create(row='A', number=number) for number in (1, 2)]
+        self.client.force_login(self.user)
+
+    def _preclaim(self, seat):
+        booking = Booking.objects.create(
+            user=self.rival, showtime=self.showtime, total_price=Decimal('10.00'), status='confirmed'
+        )
+        booking.seats.set([seat])
+        SeatInventory.claim_seats(booking, [seat])
+
+    @mock.patch('bookings.views._session_hold_is_valid', return_value=True)
+    @mock.patch('bookings.views.PaymentForm')
+    @mock.patch.object(PaymentService, 'process_payment', create=True, return_value={'payment_id': 'pi_lost'})
+    def test_payment_for_claimed_seat_is_refunded(self, process_payment, form, hold_valid, send_confirmation, refund):
+        form.return_value.is_valid.return_value = True
+        form.return_value.cleaned_data = {
+            'card_number': '4242424242424242', 'expiry_date': '12/30', 'cvv': '123', 'name_on_card': 'Moviegoer'
+        }
+        self._preclaim(self.seats[1])
+        send_confirmation.reset_mock()
+        session = self.client.session
+        session['showtime_id'] = self.showtime.id
+        session['selected_seat_ids'] = [seat.id for seat in self.seats]
+        session.save()
+
+        # Slip the rival's claim past the pre-payment availability check
+        with mock.patch.object(SeatInventory, 'get_reserved_seat_ids', return_value=[]):
+            response = self.client.post('/bookings/payment/', HTTP_HOST='localhost')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['refund'], 'scheduled')
+        booking = Booking.objects.get(payment_id='pi_lost')
+        self.assertEqual(booking.status, 'cancelled')
+        refund.assert_called_once_with(booking.id)
+        send_confirmation.assert_not_called()
+        self.assertFalse(SeatReservation.objects.filter(booking=booking).exists())
+
+    @mock.patch.object(SeatHoldService, 'verify', side_effect=SeatHoldError("Seat holds are temporarily unavailable"))
+    @mock.patch('bookings.views.PaymentForm')
+    @mock.patch.object(PaymentService, 'process_payment', create=True)
+    def test_payment_is_not_charged_when_the_hold_cannot_be_checked(
+            self, process_payment, form, verify, send_confirmation, refund):
+        form.return_value.is_valid.return_value = True
+        form.return_value.cleaned_data = {
+            'card_number': '4242424242424242', 'expiry_date': '12/30', 'cvv': '123', 'name_on_card': 'Moviegoer'
+        }
+        session = self.client.session
+        session['showtime_id'] = self.showtime.id
+        session['selected_seat_ids'] = [seat.id for seat in self.seats]
+        session['seat_hold'] = {'showtime_id': self.showtime.id, 'token': 'abc'}
+        session.save()
+
+        response = self.client.post('/bookings/payment/', HTTP_HOST='localhost')
+
+        self.assertEqual(response.status_code, 503)
+        process_payment.assert_not_called()
+        self.assertFalse(Booking.objects.filter(user=self.user).exists())
+
+    @mock.patch.object(PaymentService, 'confirm_payment', return_value=True)
+    def test_confirm_payment_for_claimed_seat_is_refunded(self, confirm_payment, send_confirmation, refund):
+        self._preclaim(self.seats[1])
+        booking = Booking.objects.create(
+            user=self.user, showtime=self.showtime, total_price=Decimal('20.00'),
+            status='pending', payment_id='pi_lost'
+        )
+        booking.seats.set(self.seats)
+
+        response = self.client.post(f'/api/bookings/{booking.id}/confirm_payment/', HTTP_HOST='localhost')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['refund'], 'scheduled')
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+        refund.assert_called_once_with(booking.id)
+
+
+@override_settings(TICKET_SIGNING_KEY='test-signing-key')
+class TicketCodeTests(SimpleTestCase):
+    EXPIRES_AT = 2_000_000_000
+
+    def test_round_trip(self):
+        code = TicketCode.encode(42, 7, ['A1', 'B3'], self.EXPIRES_AT)
+        self.assertEqual(TicketCode.decode(code, now=0), {
+            'booking_id': 42, 'showtime_id': 7, 'seats': ['A1', 'B3'], 'expires_at': self.EXPIRES_AT,
+        })
+
+    def test_large_ids_and_seats_outside_the_original_grid(self):
+        booking_id = 2 ** 40 + 5
+        code = TicketCode.encode(booking_id, 2 ** 33, ['G12', 'Z300'], self.EXPIRES_AT)
+        claim = TicketCode.decode(code, now=0)
+        self.assertEqual((claim['booking_id'], claim['showtime_id']), (booking_id, 2 ** 33))
+        self.assertEqual(claim['seats'], ['G12', 'Z300'])
+
+    def test_tampered_code_is_rejected(self):
+        code = TicketCode.encode(42, 7, ['A1'], self.EXPIRES_AT)
+        tampered = code[:5] + ('A' if code[5] != 'A' else 'B') + code[6:]
+        with self.assertRaises(InvalidTicketCodeError):
+            TicketCode.decode(tampered, now=0)
+
+    def test_code_signed_with_another_key_is_rejected(self):
+        code = TicketCode.encode(42, 7, ['A1'], self.EXPIRES_AT, key=b'someone-else')
+        with self.assertRaisesMessage(InvalidTicketCodeError, "signature"):
+            TicketCode.decode(code, now=0)
+
+    def test_garbage_is_rejected(self):
+        for code in ('', 'not a code!', 'ABCDEFGH'):
+            with self.assertRaises(InvalidTicketCodeError):
+                TicketCode.decode(code, now=0)
+
+    def test_expired_code_reports_its_claim(self):
+        code = TicketCode.encode(42, 7, ['A1'], self.EXPIRES_AT)
+        with self.assertRaises(ExpiredTicketCodeError) as raised:
+            TicketCode.decode(code, now=self.EXPIRES_AT + 1)
+        self.assertEqual(raised.exception.claim['booking_id'], 42)
+
+    def test_version_1_codes_still_decode(self):
+        bitmap = bytearray(6)
+        bitmap[0] = 0x80  # A1
+        body = V1_HEADER.pack(1, 42, 7, self.EXPIRES_AT) + bytes(bitmap)
+        mac = hmac.new(TicketCode.signing_key(), body, hashlib.sha256).digest()[:MAC_BYTES]
+        code = base64.b32encode(body + mac).decode().rstrip('=')
+        self.assertEqual(TicketCode.decode(code, now=0)['seats'], ['A1'])
+
+
+@override_settings(TICKET_SIGNING_KEY='test-signing-key')
+class ValidateTicketTests(TestCase):
+    url = '/api/bookings/validate_ticket/'
+
+    def setUp(self):
+        self.staff = User.objects.create_user('doorman', password='x', is_staff=True)
+        user = User.objects.create_user('moviegoer', password='x')
+        movie = Movie.objects.create(tmdb_id=550, title='Fight Club')
+        theater = Theater.objects.create(name='Screen 1', location='Downtown', total_seats=48)
+        self.showtime, self.other_showtime = [
+            Showtime.objects.create(
+                movie=movie, theater=theater, date=datetime.date(2030, 1, 1), time=datetime.time(hour, 0)
+            )
+            for hour in (17, 20)
+        ]
+        self.seats = [Seat.objects.create(row='A', number=number) for number in (1, 2)]
+        self.booking = Booking.objects.create(
+            user=user, showtime=self.showtime, total_price=Decimal('20.00'), status='confirmed'
+        )
+        self.booking.seats.set(self.seats)
+        self.client.force_login(self.staff)
+
+    def _validate(self, data):
+        return self.client.post(self.url, data, content_type='application/json', HTTP_HOST='localhost')
+
+    def test_valid_code(self):
+        response = self._validate({'code': TicketCode.for_booking(self.booking), 'showtime_id': self.showtime.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['valid'])
+
+    def test_code_for_another_showtime_is_refused(self):
+        response = self._validate({
+            'code': TicketCode.for_booking(self.booking), 'showtime_id': self.other_showtime.id
+        })
+        self.assertEqual(response.status_code, 409)
+
+    def test_code_claiming_the_booking_under_another_showtime_is_refused(self):
+        code = TicketCode.encode(self.booking.id, self.other_showtime.id, ['A1'], 2_000_000_000)
+        self.assertEqual(self._validate({'code': code}).status_code, 409)
+
+    def test_seats_released_from_the_booking_are_refused(self):
+        code = TicketCode.for_booking(self.booking)
+        self.booking.seats.set(self.seats[:1])
+        self.assertEqual(self._validate({'code': code}).status_code, 409)
+
+    def test_non_string_code_is_a_bad_request(self):
+        self.assertEqual(self._validate({'code': 123}).status_code, 400)
+
+
+class BestAvailableFinderTests(TestCase):
+    def setUp(self):
+        # Row B has no seat 3
+        for row, numbers in (('A', (1, 2, 3, 4)), ('B', (1, 2, 4))):
+            for number in numbers:
+                Seat.objects.create(row=row, number=number)
+        self.theater = Theater.objects.create(name='Screen 1', location='Downtown', total_seats=8)
+        self.layout = SeatMapService._build_layout(self.theater)
+        self.seat_ids = {str(seat): seat.id for seat in Seat.objects.all()}
+
+    def _find(self, occupied_labels, count, top_k=10):
+        occupied = {self.seat_ids[label] for label in occupied_labels}
+        occupancy = SeatMapService.encode_occupancy(self.layout, occupied)
+        return BestAvailableFinder(self.layout, occupancy).find(count, top_k)
+
+    def test_layout_leaves_a_hole_for_the_missing_seat(self):
+        self.assertEqual(self.layout['columns'], 4)
+        self.assertEqual(self.layout['seat_ids'][4:], [self.seat_ids['B1'], self.seat_ids['B2'], None, self.seat_ids['B4']])
+
+    def test_blocks_never_span_a_missing_seat(self):
+        blocks = {(block['row'], tuple(block['numbers'])) for block in self._find([], 2)}
+        self.assertEqual(blocks, {('A', (1, 2)), ('A', (2, 3)), ('A', (3, 4)), ('B', (1, 2))})
+
+    def test_block_seat_ids_match_their_row_and_numbers(self):
+        for block in self._find(['A1', 'A2'], 2):
+            expected = [self.seat_ids[f"{block['row']}{number}"] for number in block['numbers']]
+            self.assertEqual(block['seat_ids'], expected)
+
+    def test_occupied_seats_are_skipped(self):
+        blocks = self._find(['A2', 'B1'], 2)
+        self.assertEqual([(block['row'], block['numbers']) for block in blocks], [('A', [3, 4])])
+
+
+class SeatHoldServiceTests(RedisTestMixin, SimpleTestCase):
+    SHOWTIME_ID = 7
+
+    def setUp(self):
+        super().setUp()
+        # Holds bump the seat map version and broadcast; neither is under test here
+        patcher = mock.patch('bookings.seat_holds._notify_inventory_changed')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _expire(self, hold):
+        """Let Redis expire a hold's keys, as it would once the TTL runs out"""
+        prefix = SeatHoldService._seat_prefix(self.SHOWTIME_ID)
+        for seat_id in hold.seat_ids:
+            self.redis.delete(f'{prefix}{seat_id}')
+        self.redis.delete(SeatHoldService._token_key(self.SHOWTIME_ID, hold.token))
+
+    def test_hold_conflicts_with_another_owners_seats(self):
+        SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=1)
+
+        with self.assertRaises(SeatHoldConflictError) as raised:
+            SeatHoldService.hold(self.SHOWTIME_ID, [2, 3], owner_id=2)
+
+        self.assertEqual(raised.exception.seat_ids, [2])
+        # All or nothing: seat 3 was not taken by the failed hold
+        self.assertEqual(SeatHoldService.get_held_seat_ids(self.SHOWTIME_ID), {1, 2})
+
+    def test_holds_on_other_showtimes_do_not_conflict(self):
+        SeatHoldService.hold(self.SHOWTIME_ID, [1], owner_id=1)
+        SeatHoldService.hold(self.SHOWTIME_ID + 1, [1], owner_id=2)
+
+    def test_verify_checks_owner_and_seats(self):
+        hold = SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=1)
+
+        self.assertTrue(SeatHoldService.verify(self.SHOWTIME_ID, hold.token, [1, 2], 1))
+        self.assertFalse(SeatHoldService.verify(self.SHOWTIME_ID, hold.token, [1, 2], 2))
+        self.assertFalse(SeatHoldService.verify(self.SHOWTIME_ID, hold.token, [1, 3], 1))
+
+    def test_release_frees_the_seats(self):
+        hold = SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=1)
+
+        self.assertEqual(SeatHoldService.release(self.SHOWTIME_ID, hold.token, owner_id=2), [])
+        self.assertEqual(sorted(SeatHoldService.release(self.SHOWTIME_ID, hold.token, owner_id=1)), [1, 2])
+
+        self.assertEqual(SeatHoldService.get_held_seat_ids(self.SHOWTIME_ID), set())
+        SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=2)
+
+    def test_extend_pushes_the_expiry_forward(self):
+        hold = SeatHoldService.hold(self.SHOWTIME_ID, [1], owner_id=1, ttl=60)
+
+        expires_at = SeatHoldService.extend(self.SHOWTIME_ID, hold.token, owner_id=1, ttl=600)
+
+        self.assertGreater(expires_at, hold.expires_at)
+        self.assertEqual(SeatHoldService.get_hold(self.SHOWTIME_ID, hold.token).expires_at, expires_at)
+        with self.assertRaises(SeatHoldExpiredError):
+            SeatHoldService.extend(self.SHOWTIME_ID, hold.token, owner_id=2)
+
+    def test_expired_hold_frees_its_seats(self):
+        hold = SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=1)
+        self._expire(hold)
+
+        self.assertFalse(SeatHoldService.verify(self.SHOWTIME_ID, hold.token, [1, 2], 1))
+        with self.assertRaises(SeatHoldExpiredError):
+            SeatHoldService.extend(self.SHOWTIME_ID, hold.token, owner_id=1)
+        SeatHoldService.hold(self.SHOWTIME_ID, [2], owner_id=2)
+
+    def test_sweep_clears_expired_holds_from_the_index(self):
+        expired = SeatHoldService.hold(self.SHOWTIME_ID, [1, 2], owner_id=1, ttl=60)
+        SeatHoldService.hold(self.SHOWTIME_ID, [3], owner_id=2, ttl=600)
+        self._expire(expired)
+
+        later = expired.expires_at.timestamp() + 1
+        with mock.patch('bookings.seat_holds.time.time', return_value=later):
+            self.assertEqual(SeatHoldService.sweep_expired(), {self.SHOWTIME_ID: [1, 2]})
+            self.assertEqual(SeatHoldService.get_held_seat_ids(self.SHOWTIME_ID), {3})
+        # The showtime still has a live hold, so it stays registered for sweeping
+        self.assertEqual(self.redis.smembers('seathold:showtimes'), {str(self.SHOWTIME_ID)})
+
+
+class SeatMapEncodingTests(SimpleTestCase):
+    LAYOUT = {'rows': ['A', 'B'], 'columns': 5, 'seat_ids': [11, 12, 13, 14, 15, 21, None, 23, 24, 25]}
+
+    def test_bits_follow_the_layout_most_significant_first(self):
+        occupancy = SeatMapService.encode_occupancy(self.LAYOUT, {11, 15, 23, 25})
+        self.assertEqual(occupancy, bytes([0b10001001, 0b01000000]))
+
+    def test_empty_and_full_maps(self):
+        self.assertEqual(SeatMapService.encode_occupancy(self.LAYOUT, set()), bytes(2))
+        every_seat = {seat_id for seat_id in self.LAYOUT['seat_ids'] if seat_id}
+        # The hole (index 6) and the padding past index 9 stay clear
+        self.assertEqual(SeatMapService.encode_occupancy(self.LAYOUT, every_seat), bytes([0b11111101, 0b11000000]))
+
+    def test_unknown_seats_are_ignored(self):
+        self.assertEqual(SeatMapService.encode_occupancy(self.LAYOUT, {99}), bytes(2))
+
+
+@mock.patch('bookings.tasks.refund_rejected_booking.delay')
+@mock.patch('bookings.booking_queue.EmailService.send_booking_confirmation')
+class BookingQueueRejectionTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('moviegoer', password='x')
+        self.rival = User.objects.create_user('rival', password='x')
+        movie = Movie.objects.create(tmdb_id=550, title='Fight Club')
+        theater = Theater.objects.create(name='Screen 1', location='Downtown', total_seats=48)
+        self.showtime = Showtime.objects.create(
+            movie=movie, theater=theater, date=datetime.date(2030, 1, 1), time=datetime.time(20, 0)
+        )
+        self.seats = [Seat.objects.create(row='A', number=number) for number in (1, 2)]
+        patcher = mock.patch.object(BookingQueue, '_schedule_drain')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pending_booking(self, user, seats):
+        booking = Booking.objects.create(
+            user=user, showtime=self.showtime, total_price=Decimal('20.00'),
+            status='pending', payment_id=f'pi_{user.username}'
+        )
+        booking.seats.set(seats)
+        return booking
+
+    def _drain(self):
+        return BookingQueue.drain(BookingQueue.partition_for(self.showtime.id))
+
+    def test_claim_that_lost_its_seats_is_rejected_and_refunded(self, send_confirmation, refund):
+        winner = self._pending_booking(self.rival, self.seats[1:])
+        loser = self._pending_booking(self.user, self.seats)
+        hold = SeatHoldService.hold(self.showtime.id, [seat.id for seat in self.seats], self.user.id)
+        won = BookingQueue.submit(winner, [self.seats[1].id])
+        lost = BookingQueue.submit(loser, [seat.id for seat in self.seats], hold={
+            'showtime_id': self.showtime.id, 'token': hold.token,
+        })
+
+        self.assertEqual(self._drain(), 2)
+
+        self.assertEqual(BookingQueue.get_result(won)['status'], 'confirmed')
+        result = BookingQueue.get_result(lost)
+        self.assertEqual(result['status'], 'rejected')
+        self.assertEqual(result['refund'], 'scheduled')
+        self.assertEqual(result['reserved_seats'], ['A2'])
+        loser.refresh_from_db()
+        self.assertEqual(loser.status, 'cancelled')
+        self.assertFalse(SeatReservation.objects.filter(booking=loser).exists())
+        refund.assert_called_once_with(loser.id)
+        send_confirmation.assert_called_once_with(winner)
+        # The loser's hold is released once the claim is decided
+        self.assertIsNone(SeatHoldService.get_hold(self.showtime.id, hold.token))
+
+    def test_replayed_rejection_is_not_refunded_again(self, send_confirmation, refund):
+        winner = self._pending_booking(self.rival, self.seats[1:])
+        SeatInventory.claim_seats(winner, self.seats[1:])
+        loser = self._pending_booking(self.user, self.seats)
+        request_id = BookingQueue.submit(loser, [seat.id for seat in self.seats])
+        self._drain()
+
+        # A drainer that died before dropping the item leaves it in the processing list
+        item = {'request_id': request_id, 'booking_id': loser.id, 'seat_ids': [seat.id for seat in self.seats], 'hold': None}
+        partition = BookingQueue.partition_for(self.showtime.id)
+        self.redis.rpush(BookingQueue._processing_key(partition), json.dumps(item))
+        self.assertEqual(self._drain(), 1)
+
+        self.assertEqual(BookingQueue.get_result(request_id)['status'], 'rejected')
+        refund.assert_called_once_with(loser.id)
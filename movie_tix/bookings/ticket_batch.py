@@ -0,0 +1,98 @@
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from multiprocessing import get_context
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from .models import Booking
+from .qr import encode_many
+from .ticket_generator import TicketGenerator
+
+logger = logging.getLogger(__name__)
+
+PER_BOOKING = 'booking'
+PER_SEAT = 'seat'
+
+# Below this many QR codes starting the pool's processes costs more than it saves
+POOL_THRESHOLD = 64
+CHUNK_SIZE = 32
+
+
+class BatchTicketRenderer:
+    """
+    Many tickets in one PDF: a page per booking or a page per seat.
+
+    The CPU-heavy part, QR encoding, is spread over a process pool
+    (TICKET_BATCH_WORKERS processes, started with 'spawn' so no Django state
+    is inherited). The pool lives only for one batch, so web workers don't
+    keep idle processes around for this staff-only endpoint. Pages are then drawn in order onto a single canvas that
+    references the artwork as one form, and the document is written to a
+    temporary file that the caller can stream.
+
+    Drawing stays serial on purpose: with the artwork shared as a form a
+    page costs about 1.2 ms to draw against 3.5 ms to encode its QR code
+    (300 per-seat pages, one core), so encoding is ~75% of the work.
+    Rendering pages in workers would also mean merging PDFs, which needs a
+    library this project doesn't depend on. The serial part caps the
+    speed-up at about 4x (roughly 2.3x with four workers).
+    """
+
+    @staticmethod
+    def bookings_for_showtime(showtime):
+        return (
+            Booking.objects.filter(showtime=showtime, status='confirmed')
+            .select_related('user', 'showtime__movie', 'showtime__theater')
+            .prefetch_related('seats')
+            .order_by('booking_time')
+        )
+
+    @staticmethod
+    def page_fields(bookings, per=PER_BOOKING):
+        pages = []
+        for booking in bookings:
+            seats = sorted(booking.seats.all(), key=lambda seat: (seat.row, seat.number))
+            if per == PER_SEAT and seats:
+                price = (booking.total_price / len(seats)).quantize(Decimal('0.01'))
+                pages.extend(TicketGenerator.page_fields(booking, [seat], price) for seat in seats)
+            else:
+                pages.append(TicketGenerator.page_fields(booking, seats))
+        return pages
+
+    @staticmethod
+    def render(bookings, per=PER_BOOKING):
+        """Return (temporary file positioned at the start, page count)"""
+        pages = BatchTicketRenderer.page_fields(bookings, per)
+        qr_codes = BatchTicketRenderer._encode_qr_codes({page['qr_data'] for page in pages})
+
+        output = tempfile.TemporaryFile()
+        p = canvas.Canvas(output, pagesize=A4)
+        TicketGenerator.add_artwork_form(p)
+        for fields in pages:
+            TicketGenerator.draw_page(p, fields, qr_codes[fields['qr_data']])
+        if not pages:
+            p.showPage()
+        p.save()
+        output.seek(0)
+        logger.info(f"Rendered {len(pages)} ticket page(s), {len(qr_codes)} QR code(s)")
+        return output, len(pages)
+
+    @staticmethod
+    def _encode_qr_codes(payloads):
+        payloads = sorted(payloads)
+        if len(payloads) < POOL_THRESHOLD or settings.TICKET_BATCH_WORKERS <= 1:
+            return dict(zip(payloads, encode_many(payloads)))
+
+        chunks = [payloads[i:i + CHUNK_SIZE] for i in range(0, len(payloads), CHUNK_SIZE)]
+        workers = min(settings.TICKET_BATCH_WORKERS, len(chunks))
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                results = list(pool.map(encode_many, chunks))
+        except Exception as e:
+            # e.g. inside a daemonic Celery worker, which may not start children
+            logger.warning(f"QR encoding pool unavailable ({e}), encoding in-process")
+            return dict(zip(payloads, encode_many(payloads)))
+        return dict(zip(payloads, (code for chunk in results for code in chunk)))
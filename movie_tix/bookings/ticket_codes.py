@@ -0,0 +1,184 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+FORMAT_VERSION = 2
+# Version 2 body: format version, booking id, showtime id, expiry (Unix seconds), seat count, then
+# each seat as its row letter and number. Ids, count and numbers are LEB128 varints, so typical
+# codes stay short while any id or seat the database can hold still fits.
+VERSION = struct.Struct('>B')
+EXPIRY = struct.Struct('>I')
+MAC_BYTES = 8
+
+# Version 1 (still accepted): uint32 ids and a bitmap of the original A-F x 1-8 seat grid
+V1_HEADER = struct.Struct('>BIII')
+V1_SEAT_ROWS = 'ABCDEF'
+V1_SEATS_PER_ROW = 8
+V1_BITMAP_BYTES = (len(V1_SEAT_ROWS) * V1_SEATS_PER_ROW + 7) // 8
+V1_BODY_BYTES = V1_HEADER.size + V1_BITMAP_BYTES
+
+
+class TicketCode:
+    """
+    Signed, compact QR payloads that door scanners can check offline.
+
+    A code packs the booking id, showtime id, expiry and the admitted seats
+    into a few bytes (about 14 for a one-seat ticket), appends a truncated
+    HMAC-SHA256 and is written in unpadded base32. Base32 only uses
+    characters from the QR alphanumeric set, so a one-seat ticket fits a
+    version 2 code instead of the version 3 needed for the raw UUID. Anyone
+    holding the signing key can verify a code with decode() alone; checking
+    that the booking wasn't cancelled since still needs the database (see
+    BookingViewSet.validate_ticket).
+    """
+
+    @staticmethod
+    def signing_key():
+        """
+        TICKET_SIGNING_KEY, or a key derived one-way from SECRET_KEY, so the
+        key handed to scanners never reveals SECRET_KEY itself.
+        """
+        if settings.TICKET_SIGNING_KEY:
+            return settings.TICKET_SIGNING_KEY.encode()
+        return hashlib.sha256(f'bookings.ticket_codes:{settings.SECRET_KEY}'.encode()).digest()
+
+    @staticmethod
+    def for_booking(booking, seats=None):
+        """Code admitting `seats` (all of the booking's seats by default) until shortly after the show starts"""
+        showtime = booking.showtime
+        if seats is None:
+            seats = booking.seats.all()
+        starts_at = datetime.combine(showtime.date, showtime.time)
+        if timezone.is_naive(starts_at):
+            starts_at = timezone.make_aware(starts_at)
+        expires_at = starts_at + timedelta(seconds=settings.TICKET_CODE_VALID_AFTER_START)
+        return TicketCode.encode(booking.id, showtime.id, [str(seat) for seat in seats], int(expires_at.timestamp()))
+
+    @staticmethod
+    def encode(booking_id, showtime_id, seat_labels, expires_at, key=None):
+        body = (
+            VERSION.pack(FORMAT_VERSION)
+            + _varint(booking_id)
+            + _varint(showtime_id)
+            + EXPIRY.pack(expires_at)
+            + TicketCode._pack_seats(seat_labels)
+        )
+        mac = hmac.new(key or TicketCode.signing_key(), body, hashlib.sha256).digest()[:MAC_BYTES]
+        return base64.b32encode(body + mac).decode().rstrip('=')
+
+    @staticmethod
+    def decode(code, key=None, now=None):
+        """
+        Verify a code and return what it admits. Raises InvalidTicketCodeError
+        for anything malformed or not signed with `key`, and
+        ExpiredTicketCodeError once the code's expiry has passed.
+        """
+        code = code.strip().upper()
+        try:
+            raw = base64.b32decode(code + '=' * (-len(code) % 8))
+        except (binascii.Error, ValueError) as e:
+            raise InvalidTicketCodeError("Not a ticket code") from e
+        if len(raw) <= VERSION.size + MAC_BYTES:
+            raise InvalidTicketCodeError("Not a ticket code")
+
+        body, mac = raw[:-MAC_BYTES], raw[-MAC_BYTES:]
+        expected = hmac.new(key or TicketCode.signing_key(), body, hashlib.sha256).digest()[:MAC_BYTES]
+        if not hmac.compare_digest(mac, expected):
+            raise InvalidTicketCodeError("Ticket signature doesn't match")
+
+        version, = VERSION.unpack_from(body)
+        if version == FORMAT_VERSION:
+            claim = TicketCode._unpack_body(body)
+        elif version == 1 and len(body) == V1_BODY_BYTES:
+            claim = TicketCode._unpack_v1_body(body)
+        else:
+            raise InvalidTicketCodeError(f"Unsupported ticket code version {version}")
+
+        if (time.time() if now is None else now) > claim['expires_at']:
+            raise ExpiredTicketCodeError(claim)
+        return claim
+
+    @staticmethod
+    def _pack_seats(seat_labels):
+        packed = bytearray(_varint(len(seat_labels)))
+        for label in seat_labels:
+            row, number = label[:1], int(label[1:])
+            packed += row.encode('ascii') + _varint(number)
+        return bytes(packed)
+
+    @staticmethod
+    def _unpack_body(body):
+        try:
+            offset = VERSION.size
+            booking_id, offset = _read_varint(body, offset)
+            showtime_id, offset = _read_varint(body, offset)
+            expires_at, = EXPIRY.unpack_from(body, offset)
+            offset += EXPIRY.size
+            count, offset = _read_varint(body, offset)
+            seats = []
+            for _ in range(count):
+                row = body[offset:offset + 1].decode('ascii')
+                number, offset = _read_varint(body, offset + 1)
+                seats.append(f"{row}{number}")
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise InvalidTicketCodeError("Malformed ticket code") from e
+        if offset != len(body):
+            raise InvalidTicketCodeError("Malformed ticket code")
+        return {'booking_id': booking_id, 'showtime_id': showtime_id, 'seats': seats, 'expires_at': expires_at}
+
+    @staticmethod
+    def _unpack_v1_body(body):
+        _, booking_id, showtime_id, expires_at = V1_HEADER.unpack_from(body)
+        bitmap = body[V1_HEADER.size:]
+        seats = [
+            f"{V1_SEAT_ROWS[index // V1_SEATS_PER_ROW]}{index % V1_SEATS_PER_ROW + 1}"
+            for index in range(len(V1_SEAT_ROWS) * V1_SEATS_PER_ROW)
+            if bitmap[index >> 3] & (0x80 >> (index & 7))
+        ]
+        return {'booking_id': booking_id, 'showtime_id': showtime_id, 'seats': seats, 'expires_at': expires_at}
+
+
+def _varint(value):
+    """Unsigned LEB128: 7 bits per byte, high bit set on all but the last byte"""
+    if value < 0:
+        raise ValueError(f"Can't encode negative value {value}")
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7F, value >> 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data, offset):
+    """Decode an unsigned LEB128 value at `offset`. Returns (value, offset after it)."""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+class InvalidTicketCodeError(Exception):
+    """Raised when a scanned code isn't a ticket code signed by us"""
+    pass
+
+
+class ExpiredTicketCodeError(InvalidTicketCodeError):
+    """Raised when a genuine ticket code is past its expiry"""
+
+    def __init__(self, claim):
+        self.claim = claim
+        super().__init__("Ticket has expired")
@@ -3,45 +3,33 @@ from reportlab.lib.pagesizes import A4, letter
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from io import BytesIO
-import qrcode
-from PIL import Image
-import tempfile
-import os
 import logging
 
+from .qr import TicketQR
+from .ticket_codes import TicketCode
+
 logger = logging.getLogger(__name__)
 
+ARTWORK_FORM_NAME = 'TicketArtwork'
+
 
 class TicketGenerator:
     PRIMARY_COLOR = colors.HexColor('#ff0040')
     SECONDARY_COLOR = colors.HexColor('#141824')
     TEXT_COLOR = colors.black
     BORDER_COLOR = colors.HexColor('#dddddd')
+    DETAIL_LABELS = ("Date:", "Time:", "Theater:", "Seats:", "Total Price:")
+    # Bump when the layout changes so stored tickets are re-rendered (see ticket_store)
+    LAYOUT_VERSION = 2
 
     @classmethod
     def generate_ticket_pdf(cls, booking):
         """Main method to generate a styled ticket as PDF."""
         buffer = BytesIO()
         p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
 
         try:
-            cls._draw_background(p, width, height)
-            cls._draw_header(p, width, height)
-            cls._draw_ticket_body(p, booking, width, height)
-
-            # QR Code
-            qr_img = cls._generate_qr_code_image(str(booking.booking_reference))
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-                qr_img.save(temp_file.name)
-                qr_path = temp_file.name
-
-            cls._draw_qr_code(p, qr_path, width, height)
-            os.unlink(qr_path)
-
-            cls._draw_footer(p, booking, width, height)
-
-            p.showPage()
+            cls.draw_page(p, cls.page_fields(booking))
             p.save()
             return buffer.getvalue()
 
@@ -51,6 +39,68 @@ class TicketGenerator:
         finally:
             buffer.close()
 
+    @staticmethod
+    def page_fields(booking, seats=None, price=None):
+        """
+        Everything printed on one ticket page, as plain picklable values.
+        `seats` narrows the page to some of the booking's seats (one page per
+        seat); `price` is then the price shown for them.
+        """
+        showtime = booking.showtime
+        title = showtime.movie.title
+        seats_display = booking.get_seats_display() if seats is None else ", ".join(str(seat) for seat in seats)
+        return {
+            'title': (title[:37] + "...") if len(title) > 40 else title,
+            'reference': str(booking.booking_reference),
+            'values': [
+                showtime.date.strftime('%A, %B %d, %Y'),
+                showtime.time.strftime('%I:%M %p'),
+                showtime.theater.name,
+                seats_display,
+                f"${booking.total_price if price is None else price:.2f}",
+            ],
+            'booked_by': booking.user.username,
+            'booking_date': booking.booking_time.strftime('%B %d, %Y, %I:%M %p'),
+            'qr_data': TicketGenerator.qr_payload(booking, seats),
+        }
+
+    @staticmethod
+    def qr_payload(booking, seats=None):
+        """What the ticket's QR code encodes: a signed code admitting `seats` (default: all of them)"""
+        return TicketCode.for_booking(booking, seats)
+
+    @classmethod
+    def add_artwork_form(cls, p):
+        """
+        Define the static artwork as a form XObject of p's document, so each
+        page of a multi-page document references it instead of redrawing it
+        """
+        p.beginForm(ARTWORK_FORM_NAME)
+        cls._draw_artwork(p, *A4)
+        p.endForm()
+
+    @classmethod
+    def draw_page(cls, p, fields, qr=None):
+        """One ticket page: the artwork (the document's form, if it has one) plus the page's fields"""
+        width, height = A4
+        if p.hasForm(ARTWORK_FORM_NAME):
+            p.doForm(ARTWORK_FORM_NAME)
+        else:
+            cls._draw_artwork(p, width, height)
+        cls._draw_ticket_body(p, fields, width, height)
+        cls._draw_qr_code(p, fields['qr_data'], width, height, qr)
+        cls._draw_footer(p, fields, width, height)
+        p.showPage()
+
+    @classmethod
+    def _draw_artwork(cls, p, width, height):
+        """Everything that is the same on every ticket"""
+        cls._draw_background(p, width, height)
+        cls._draw_header(p, width, height)
+        cls._draw_ticket_frame(p, width, height)
+        cls._draw_qr_caption(p, width, height)
+        cls._draw_footer_notes(p, width, height)
+
     @classmethod
     def _draw_background(cls, p, width, height):
         p.setFillColor(colors.white)
@@ -65,49 +115,56 @@ class TicketGenerator:
         p.drawString(1 * inch, height - 1 * inch, "MovieTime Ticket")
 
     @classmethod
-    def _draw_ticket_body(cls, p, booking, width, height):
+    def _draw_ticket_frame(cls, p, width, height):
         p.setFillColor(colors.white)
         p.setStrokeColor(cls.BORDER_COLOR)
         p.setLineWidth(2)
         p.roundRect(0.5 * inch, height - 7 * inch, width - inch, 5 * inch, 10, stroke=1, fill=1)
 
-        # Movie Title
-        p.setFillColor(cls.PRIMARY_COLOR)
-        p.setFont("Helvetica-Bold", 18)
-        title = booking.showtime.movie.title
-        title = (title[:37] + "...") if len(title) > 40 else title
-        p.drawString(1 * inch, height - 2.25 * inch, title)
-
-        # Booking Reference
+        # Booking Reference box
         p.setFillColor(cls.SECONDARY_COLOR)
         p.roundRect(width - 3.5 * inch, height - 2.4 * inch, 2 * inch, 0.4 * inch, 5, fill=1)
-        p.setFillColor(colors.white)
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(width - 3.3 * inch, height - 2.15 * inch, f"Ref: {booking.booking_reference}")
 
         # Separator
         p.setStrokeColor(cls.BORDER_COLOR)
         p.setLineWidth(1)
         p.line(1 * inch, height - 2.6 * inch, width - 1 * inch, height - 2.6 * inch)
 
-        # Details
-        cls._draw_label_value(p, "Date:", booking.showtime.date.strftime('%A, %B %d, %Y'), height - 3.1 * inch)
-        cls._draw_label_value(p, "Time:", booking.showtime.time.strftime('%I:%M %p'), height - 3.5 * inch)
-        cls._draw_label_value(p, "Theater:", booking.showtime.theater.name, height - 3.9 * inch)
-        cls._draw_label_value(p, "Seats:", booking.get_seats_display(), height - 4.3 * inch)
-        cls._draw_label_value(p, "Total Price:", f"${booking.total_price:.2f}", height - 4.7 * inch)
+        # Detail labels
+        p.setFont("Helvetica-Bold", 12)
+        p.setFillColor(cls.TEXT_COLOR)
+        for label, y in zip(cls.DETAIL_LABELS, cls._detail_rows(height)):
+            p.drawString(1 * inch, y, label)
+
+    @staticmethod
+    def _detail_rows(height):
+        return [height - (3.1 + 0.4 * i) * inch for i in range(5)]
 
     @classmethod
-    def _draw_label_value(cls, p, label, value, y):
+    def _draw_ticket_body(cls, p, fields, width, height):
+        # Movie Title
+        p.setFillColor(cls.PRIMARY_COLOR)
+        p.setFont("Helvetica-Bold", 18)
+        p.drawString(1 * inch, height - 2.25 * inch, fields['title'])
+
+        # Booking Reference
+        p.setFillColor(colors.white)
         p.setFont("Helvetica-Bold", 12)
-        p.setFillColor(cls.TEXT_COLOR)
-        p.drawString(1 * inch, y, label)
+        p.drawString(width - 3.3 * inch, height - 2.15 * inch, f"Ref: {fields['reference']}")
+
+        # Details
         p.setFont("Helvetica", 12)
-        p.drawString(2 * inch, y, value)
+        p.setFillColor(cls.TEXT_COLOR)
+        for value, y in zip(fields['values'], cls._detail_rows(height)):
+            p.drawString(2 * inch, y, value)
+
+    @classmethod
+    def _draw_qr_code(cls, p, data, width, height, qr=None):
+        # Vector modules, no raster; batch rendering passes codes encoded in its worker pool
+        TicketQR.draw(p, data, width - 3.5 * inch, height - 4.7 * inch, 2 * inch, encoded=qr)
 
     @classmethod
-    def _draw_qr_code(cls, p, qr_path, width, height):
-        p.drawImage(qr_path, width - 3.5 * inch, height - 4.7 * inch, width=2 * inch, height=2 * inch)
+    def _draw_qr_caption(cls, p, width, height):
         p.setFillColor(cls.SECONDARY_COLOR)
         p.setFont("Helvetica", 8)
         p.drawCentredString(width - 2.5 * inch, height - 5 * inch, "Scan at the theater entrance")
@@ -118,35 +175,25 @@ class TicketGenerator:
         p.line(0.5 * inch, height - 5.25 * inch, width - 0.5 * inch, height - 5.25 * inch)
 
     @classmethod
-    def _draw_footer(cls, p, booking, width, height):
+    def _draw_footer_notes(cls, p, width, height):
         p.setFont("Helvetica", 8)
         p.setFillColor(cls.TEXT_COLOR)
-        p.drawString(1 * inch, height - 5.75 * inch, f"Booked by: {booking.user.username}")
-        p.drawString(1 * inch, height - 6 * inch, f"Booking Date: {booking.booking_time.strftime('%B %d, %Y, %I:%M %p')}")
         p.drawRightString(width - 1 * inch, height - 5.75 * inch, "MovieTime - Your ultimate movie experience")
         p.drawRightString(width - 1 * inch, height - 6 * inch, "For assistance, contact: support@movietime.com")
         p.setFont("Helvetica-Oblique", 8)
         p.drawCentredString(width / 2, height - 6.5 * inch, "Please arrive 15 minutes before showtime. No refunds or exchanges.")
 
-    @staticmethod
-    def _generate_qr_code_image(data):
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        return qr.make_image(fill_color="black", back_color="white")
+    @classmethod
+    def _draw_footer(cls, p, fields, width, height):
+        p.setFont("Helvetica", 8)
+        p.setFillColor(cls.TEXT_COLOR)
+        p.drawString(1 * inch, height - 5.75 * inch, f"Booked by: {fields['booked_by']}")
+        p.drawString(1 * inch, height - 6 * inch, f"Booking Date: {fields['booking_date']}")
 
     @staticmethod
     def generate_qr_code(booking):
         """Return QR code PNG bytes for use elsewhere (e.g., email)."""
-        img = TicketGenerator._generate_qr_code_image(str(booking.booking_reference))
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        return buffer.getvalue()
+        return TicketQR.png(TicketGenerator.qr_payload(booking))
 
     @staticmethod
     def _generate_fallback_pdf(booking):
@@ -165,4 +212,5 @@ class TicketGenerator:
             return buffer.getvalue()
         except Exception as e:
             logger.error(f"Fallback PDF generation failed: {e}")
-            return b"%PDF-1.4\n1 0 obj\n<</Type/Catalog/Pages 2 0 R>>\nendobj\n..."
\ No newline at end of file
+            return b"%PDF-1.4\n1 0 obj\n<</Type/Catalog/Pages 2 0 R>>\nendobj\n..."
+
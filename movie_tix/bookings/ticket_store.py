@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+from movies.single_flight import SingleFlight
+from .ticket_generator import TicketGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class TicketStore:
+    """
+    Rendered ticket PDFs, kept in the TICKET_STORAGE storage.
+
+    A ticket is saved as tickets/<booking_reference>/<fingerprint>.pdf, where
+    the fingerprint hashes every field printed on it. Emails and downloads
+    share one rendering, and any change to what the ticket shows (seats,
+    price, showtime, movie title, layout) maps to a new file rather than a
+    stale one. Superseded files are removed when the booking changes (see
+    bookings.signals).
+    """
+
+    @staticmethod
+    def get_storage():
+        return storages[settings.TICKET_STORAGE]
+
+    @staticmethod
+    def ticket_fields(booking):
+        """Everything TicketGenerator prints for this booking"""
+        showtime = booking.showtime
+        return {
+            'layout': TicketGenerator.LAYOUT_VERSION,
+            'reference': str(booking.booking_reference),
+            'title': showtime.movie.title,
+            'date': showtime.date.isoformat(),
+            'time': showtime.time.isoformat(),
+            'theater': showtime.theater.name,
+            'seats': booking.get_seats_display(),
+            'total_price': f"{booking.total_price:.2f}",
+            'username': booking.user.username,
+            'booking_time': booking.booking_time.isoformat(),
+            'qr_data': TicketGenerator.qr_payload(booking),
+        }
+
+    @staticmethod
+    def fingerprint(booking):
+        payload = json.dumps(TicketStore.ticket_fields(booking), sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+    @staticmethod
+    def _directory(booking):
+        return f'tickets/{booking.booking_reference}'
+
+    @staticmethod
+    def get_ticket(booking):
+        """Return (storage path, fingerprint) of the booking's ticket, rendering it if not stored yet"""
+        storage = TicketStore.get_storage()
+        digest = TicketStore.fingerprint(booking)
+        path = f'{TicketStore._directory(booking)}/{digest}.pdf'
+
+        def lookup():
+            return (path, digest) if storage.exists(path) else None
+
+        entry = lookup()
+        if entry is None:
+            entry = SingleFlight.do(
+                f'ticket:{digest}', fetch=lambda: TicketStore._render(booking, storage, path, digest), lookup=lookup
+            )
+            if entry is None:
+                raise TicketStoreError(f"Timed out rendering ticket for booking {booking.id}")
+        return entry
+
+    @staticmethod
+    def get_pdf(booking):
+        """PDF bytes of the booking's ticket, e.g. for an email attachment"""
+        path, _ = TicketStore.get_ticket(booking)
+        with TicketStore.get_storage().open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def open(booking):
+        """Return (open file, fingerprint) for streaming the ticket"""
+        path, digest = TicketStore.get_ticket(booking)
+        return TicketStore.get_storage().open(path, 'rb'), digest
+
+    @staticmethod
+    def _render(booking, storage, path, digest):
+        data = TicketGenerator.generate_ticket_pdf(booking)
+        if storage.exists(path):
+            # Another process stored it between our lookup and taking the lease
+            return path, digest
+        saved_path = storage.save(path, ContentFile(data))
+        if saved_path != path:
+            # Storages pick a new name rather than overwrite; keep the one that was there first
+            storage.delete(saved_path)
+        logger.info(f"Stored ticket for booking {booking.id}: {path} ({len(data)} bytes)")
+        return path, digest
+
+    @staticmethod
+    def invalidate(booking, keep_current=True):
+        """
+        Delete stored tickets of a booking that no longer match it. Everything
+        goes when the booking isn't confirmed or `keep_current` is False.
+        """
+        storage = TicketStore.get_storage()
+        directory = TicketStore._directory(booking)
+        try:
+            _, files = storage.listdir(directory)
+        except FileNotFoundError:
+            return 0
+        if not files:
+            return 0
+
+        current = None
+        if keep_current and booking.status == 'confirmed':
+            current = f'{TicketStore.fingerprint(booking)}.pdf'
+        removed = 0
+        for name in files:
+            if name != current:
+                storage.delete(f'{directory}/{name}')
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale ticket(s) for booking {booking.id}")
+        return removed
+
+
+class TicketStoreError(Exception):
+    """Raised when a ticket could not be rendered or stored"""
+    pass
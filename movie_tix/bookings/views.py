@@ -1,36 +1,39 @@
-import datetime
 import logging
 import json
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, JsonResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.shortcuts import render
 from django.utils import timezone
-from django.utils.dateparse import parse_date
 
 from movies.models import Movie
-from movies.tmdb_api import fetch_movie_details
+from movies.catalog_sync import CatalogSync
+from .availability import AvailabilityService
+from .booking_queue import BookingQueue, BookingQueueError
 from .email_service import EmailService
 from .forms import PaymentForm
-from .models import Theater, Showtime, Seat, Booking
+from .inventory import SeatInventory, SeatUnavailableError
+from .models import Showtime, Seat, Booking
 from .payment import PaymentService, PaymentError
-from .ticket_generator import TicketGenerator
+from .seat_holds import SeatHoldService, SeatHoldError, SeatHoldConflictError
+from .ticket_batch import BatchTicketRenderer, PER_SEAT
+from .ticket_store import TicketStore, TicketStoreError
 
 
 logger = logging.getLogger(__name__)
 
+# How long one request to build a movie's schedule stands before page views may ask again
+SCHEDULE_REQUEST_LEASE = 300
+
 @login_required
 def select_date_time(request, movie_id):
     """View to select date and time for a movie"""
     # Validate the movie_id
-
-    import time
-    start_time = time.time()
-    logger.info("START: select_date_time")
-
     try:
         tmdb_id = int(movie_id)
         if tmdb_id <= 0:
@@ -44,62 +47,25 @@ def select_date_time(request, movie_id):
             'message': "Invalid movie ID format"
         }, status=400)
 
-    logger.info(f"[{tmdb_id}] After validation: {time.time() - start_time:.2f}s")
-
-    # Try to get the movie from the database by tmdb_id
-    try:
-        movie = Movie.objects.get(tmdb_id=tmdb_id)
-        logger.info(f"Found movie in database with tmdb_id={tmdb_id}")
-    except Movie.DoesNotExist:
-        # If the movie doesn't exist in our database, get it from TMDB and save it
-        logger.info(f"Movie with tmdb_id={tmdb_id} not found in database, fetching from TMDB")
-        tmdb_movie = fetch_movie_details(tmdb_id)
-
-        if tmdb_movie:
-            # Verify the ID matches what we requested
-            if tmdb_movie['tmdb_id'] != tmdb_id:
-                logger.error(f"TMDB ID mismatch: requested {tmdb_id}, received {tmdb_movie['tmdb_id']}")
-                return JsonResponse({
-                    'success': False,
-                    'message': "Error retrieving movie information. Please try again."
-                }, status=500)
-
-            # Create a new Movie object with the TMDB data
-            movie_data = {
-                'tmdb_id': tmdb_movie['tmdb_id'],  # Use the explicit tmdb_id from response
-                'title': tmdb_movie['title'],
-                'overview': tmdb_movie.get('overview', ''),
-                'poster_path': tmdb_movie.get('poster_path', ''),
-                'backdrop_path': tmdb_movie.get('backdrop_path', ''),
-            }
-
-            # Handle release_date separately to avoid format issues
-            release_date = tmdb_movie.get('release_date', '')
-            if release_date and isinstance(release_date, str) and len(release_date) >= 10:  # Check if it's in YYYY-MM-DD format
-                try:
-                    # Try to parse the date
-                    parsed_date = parse_date(release_date)
-                    if parsed_date:
-                        movie_data['release_date'] = parsed_date
-                except (ValueError, TypeError):
-                    # If parsing fails, log the error
-                    logger.warning(f"Failed to parse release date: {release_date}")
-                    # Don't include the release_date
-                    pass
-
-            logger.info(f"Creating new movie entry with tmdb_id={tmdb_id}")
-            movie = Movie.objects.create(**movie_data)
-        else:
-            logger.error(f"Failed to fetch movie with tmdb_id={tmdb_id} from TMDB API")
+    movie = Movie.objects.filter(tmdb_id=tmdb_id).first()
+    if movie is None:
+        if CatalogSync.is_missing(tmdb_id):
             return JsonResponse({
                 'success': False,
-                'message': "Movie not found or API error occurred."
+                'message': "Movie not found."
             }, status=404)
 
-    # Get dates for the next 7 days
+        # Not in the catalog yet: sync it in the background instead of waiting on TMDB here
+        CatalogSync.request_movie(tmdb_id)
+        response = JsonResponse({
+            'success': False,
+            'status': 'loading',
+            'message': "Loading movie details, please try again in a moment."
+        }, status=202)
+        response['Retry-After'] = '2'
+        return response
+
     today = timezone.now().date()
-    dates = [today + datetime.timedelta(days=i) for i in range(7)]
-    formatted_dates = [date.strftime('%Y-%m-%d') for date in dates]
 
     # Check if there are any showtimes for this movie
     showtimes = Showtime.objects.filter(
@@ -107,127 +73,13 @@ def select_date_time(request, movie_id):
         date__gte=today
     ).order_by('date', 'time')
 
-    # If no showtimes exist, create some sample ones for testing
+    # Schedules are built in the background; a movie seen for the first time gets queued
     if not showtimes.exists():
-        # Get or create theaters with different features
-        main_theater, created = Theater.objects.get_or_create(
-            name="MovieTime Main Cinema",
-            defaults={
-                'location': '123 Main Street',
-                'total_seats': 48,
-                'has_imax': False,
-                'has_3d': False
-            }
-        )
-
-        imax_theater, created = Theater.objects.get_or_create(
-            name="MovieTime IMAX",
-            defaults={
-                'location': '123 Main Street',
-                'total_seats': 60,
-                'has_imax': True,
-                'has_3d': False
-            }
-        )
-
-        premium_theater, created = Theater.objects.get_or_create(
-            name="MovieTime Premium",
-            defaults={
-                'location': '123 Main Street',
-                'total_seats': 36,
-                'has_imax': False,
-                'has_3d': True
-            }
-        )
+        _schedule_showtimes(movie)
 
-        # Create different showtime patterns based on the movie
-        # The patterns differ based on the tmdb_id to ensure variety
-        if movie.tmdb_id % 3 == 0:  # Pattern 1
-            times = [
-                (datetime.time(10, 30), main_theater, 10.00, 8.00),  # Morning, standard
-                (datetime.time(14, 0), main_theater, 11.50, 9.00),   # Afternoon, standard
-                (datetime.time(17, 30), imax_theater, 15.00, 12.00), # Evening, IMAX
-                (datetime.time(20, 0), main_theater, 12.50, 9.50),   # Night, standard
-            ]
-        elif movie.tmdb_id % 3 == 1:  # Pattern 2
-            times = [
-                (datetime.time(11, 15), premium_theater, 12.00, 9.50),  # Morning, 3D
-                (datetime.time(15, 45), main_theater, 11.00, 8.50),     # Afternoon, standard
-                (datetime.time(18, 30), imax_theater, 15.50, 12.50),    # Evening, IMAX
-                (datetime.time(21, 15), premium_theater, 13.00, 10.00), # Night, 3D
-            ]
-        else:  # Pattern 3
-            times = [
-                (datetime.time(9, 45), main_theater, 9.50, 7.50),       # Morning, standard
-                (datetime.time(13, 30), premium_theater, 12.50, 10.00), # Afternoon, 3D
-                (datetime.time(16, 45), main_theater, 11.50, 9.00),     # Evening, standard
-                (datetime.time(19, 45), imax_theater, 16.00, 13.00),    # Night, IMAX
-            ]
-
-        # Create showtimes using get_or_create to avoid duplicate entries
-        for i in range(7):
-            date = today + datetime.timedelta(days=i)
-
-            # Adjust the number of showtimes per day based on the day of week
-            # Weekends have more showtimes
-            is_weekend = date.weekday() >= 5  # 5 and 6 are Saturday and Sunday
-
-            # Use all times for weekends, limit for weekdays
-            day_times = times if is_weekend else times[:3]
-
-            for time_data in day_times:
-                time, theater, price, student_price = time_data
-                try:
-                    # Try to get existing showtime or create a new one
-                    showtime, created = Showtime.objects.get_or_create(
-                        movie=movie,
-                        theater=theater,
-                        date=date,
-                        time=time,
-                        defaults={
-                            'price': price,
-                            'student_price': student_price
-                        }
-                    )
-
-                    # Update the price if it exists but price is not set
-                    if not created and (showtime.price == 0 or showtime.student_price == 0):
-                        showtime.price = price
-                        showtime.student_price = student_price
-                        showtime.save()
-
-                except Exception as e:
-                    logger.error(f"Error creating showtime: {e}")
-                    # Continue with the next time slot if there's an error
-
-        # Refresh the showtimes queryset
-        showtimes = Showtime.objects.filter(
-            movie=movie,
-            date__gte=today
-        ).order_by('date', 'time')
-
-    # Group showtimes by date and format for JSON response
-    showtimes_by_date = {}
-    for date in dates:
-        date_str = date.strftime('%Y-%m-%d')
-        date_showtimes = []
-        
-        for showtime in showtimes.filter(date=date):
-            date_showtimes.append({
-                'id': showtime.id,
-                'time': showtime.time.strftime('%H:%M'),
-                'theater': {
-                    'id': showtime.theater.id,
-                    'name': showtime.theater.name,
-                    'has_imax': showtime.theater.has_imax,
-                    'has_3d': showtime.theater.has_3d
-                },
-                'price': float(showtime.price),
-                'student_price': float(showtime.student_price),
-                'available_seats': showtime.get_available_seats_count()
-            })
-        
-        showtimes_by_date[date_str] = date_showtimes
+    # Dates, showtimes, theaters and seat counts in a single query
+    dates, showtimes_by_date = AvailabilityService.get_schedule(movie.id, days=7, start_date=today)
+    formatted_dates = [date.strftime('%Y-%m-%d') for date in dates]
 
     # Prepare movie data for response
     movie_data = {
@@ -254,44 +106,9 @@ def select_seats(request, showtime_id):
     # Get the showtime by ID
     showtime = get_object_or_404(Showtime, id=showtime_id)
     
-    # Get all seats for this showtime
-    all_seats = Seat.objects.filter(showtime=showtime)
-    
-    # If no seats exist for this showtime, create them
-    if not all_seats.exists():
-        # Create initial seats for this showtime if they don't exist yet
-        logger.info(f"Creating seats for showtime {showtime_id}")
-        seats = []
-        
-        # Determine rows and columns based on total_seats
-        total_seats = showtime.theater.total_seats
-        if total_seats <= 36:
-            rows = 6
-            columns = 6
-        elif total_seats <= 48:
-            rows = 8
-            columns = 6
-        else:
-            rows = 8
-            columns = 8
-        
-        # Create seats with row and column labels
-        for i in range(1, rows + 1):
-            row_label = chr(64 + i)  # A, B, C, etc.
-            for j in range(1, columns + 1):
-                seat = Seat(
-                    showtime=showtime,
-                    row=row_label,
-                    number=j,
-                    is_reserved=False
-                )
-                seats.append(seat)
-        
-        # Bulk create all seats
-        Seat.objects.bulk_create(seats)
-        
-        # Get all seats after creation
-        all_seats = Seat.objects.filter(showtime=showtime)
+    # Seats are shared by all showtimes; occupancy comes from the showtime's claims
+    all_seats = Seat.objects.all().order_by('row', 'number')
+    reserved_seat_ids = set(SeatInventory.get_reserved_seat_ids(showtime.id))
     
     # Convert seat data to a format suitable for JSON response
     rows = {}
@@ -303,7 +120,7 @@ def select_seats(request, showtime_id):
             'id': seat.id,
             'row': seat.row,
             'number': seat.number,
-            'is_reserved': seat.is_reserved,
+            'is_reserved': seat.id in reserved_seat_ids,
             'price': float(showtime.price),
             'student_price': float(showtime.student_price)
         })
@@ -367,7 +184,7 @@ def payment(request):
     selected_seats = Seat.objects.filter(id__in=selected_seat_ids)
     
     # Check if any of the selected seats are already reserved
-    reserved_seats = selected_seats.filter(is_reserved=True)
+    reserved_seats = selected_seats.filter(id__in=SeatInventory.get_reserved_seat_ids(showtime.id))
     if reserved_seats.exists():
         # Format the list of reserved seats for display
         reserved_seat_labels = [f"{seat.row}{seat.number}" for seat in reserved_seats]
@@ -399,6 +216,21 @@ def payment(request):
             cvv = form.cleaned_data['cvv']
             name_on_card = form.cleaned_data['name_on_card']
             
+            # Make sure the seats are still held for this user before charging the card
+            try:
+                hold_is_valid = _session_hold_is_valid(request, showtime, selected_seat_ids)
+            except SeatHoldError as e:
+                logger.warning(f"Could not verify seat hold for showtime {showtime.id}, not charging: {e}")
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Seat reservations are temporarily unavailable. Please try again shortly.'
+                }, status=503)
+            if not hold_is_valid:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Your seat hold has expired. Please select your seats again.'
+                }, status=409)
+            
             # Create payment description
             payment_description = f"MovieTix booking for {showtime.movie.title} on {showtime.date}, {showtime.time}"
             
@@ -413,39 +245,60 @@ def payment(request):
                     description=payment_description
                 )
                 
-                # If payment is successful, create booking
+                if settings.BOOKING_QUEUE_ENABLED:
+                    return _queue_booking(request, showtime, selected_seats, total_price,
+                                          payment_result.get('payment_id', ''))
+                
+                # Record the paid booking as pending; it is confirmed only once its seats are claimed
                 with transaction.atomic():
-                    # Create booking
                     booking = Booking.objects.create(
                         user=request.user,
                         showtime=showtime,
                         booking_time=timezone.now(),
                         payment_id=payment_result.get('payment_id', ''),
                         total_price=total_price,
-                        status='confirmed'
+                        status='pending'
                     )
-                    
-                    # Associate seats with the booking and mark them as reserved
-                    for seat in selected_seats:
-                        seat.is_reserved = True
-                        seat.bookings.add(booking)
-                        seat.save()
-                    
-                    # Clear booking session data
-                    if 'showtime_id' in request.session:
-                        del request.session['showtime_id']
-                    if 'selected_seat_ids' in request.session:
-                        del request.session['selected_seat_ids']
-                    request.session.modified = True
-                    
-                    # Return success response with booking details
+                    booking.seats.set(selected_seats)
+
+                try:
+                    with transaction.atomic():
+                        SeatInventory.claim_seats(booking, selected_seats)
+                        booking.status = 'confirmed'
+                        booking.save()
+                except SeatUnavailableError as e:
+                    # Another booking claimed one of the seats first; the card was already charged
+                    booking.status = 'cancelled'
+                    booking.notes = f"{booking.notes}\n{e}".strip()
+                    booking.save()
+                    PaymentService.refund_rejected_booking(booking, e)
                     return JsonResponse({
-                        'success': True,
-                        'message': 'Payment successful!',
-                        'booking_id': booking.id,
-                        'redirect': f"/bookings/{booking.id}/"
-                    })
-                    
+                        'success': False,
+                        'message': f"One or more selected seats are no longer available: {', '.join(e.seat_labels)}. "
+                                   f"Your payment will be refunded.",
+                        'reserved_seats': e.seat_labels,
+                        'refund': 'scheduled'
+                    }, status=409)
+
+                # The claim owns the seats now that it has committed; only then can the hold go
+                _release_session_hold(request)
+                EmailService.send_booking_confirmation(booking)
+
+                # Clear booking session data
+                if 'showtime_id' in request.session:
+                    del request.session['showtime_id']
+                if 'selected_seat_ids' in request.session:
+                    del request.session['selected_seat_ids']
+                request.session.modified = True
+
+                # Return success response with booking details
+                return JsonResponse({
+                    'success': True,
+                    'message': 'Payment successful!',
+                    'booking_id': booking.id,
+                    'redirect': f"/bookings/{booking.id}/"
+                })
+
             except PaymentError as e:
                 # Return payment error
                 logger.error(f"Payment error: {str(e)}")
@@ -502,18 +355,8 @@ def payment_confirm(request, booking_id):
     # Generate and send ticket if not already sent
     if not booking.ticket_sent:
         try:
-            ticket_generator = TicketGenerator()
-            email_service = EmailService()
-            
-            # Generate ticket
-            ticket_path = ticket_generator.generate_ticket(booking)
-            
-            # Send email with ticket
-            email_service.send_ticket_email(booking, ticket_path)
-            
-            # Mark ticket as sent
-            booking.ticket_sent = True
-            booking.save()
+            # The email attaches the stored ticket, rendering it once if needed
+            EmailService.send_booking_confirmation(booking)
         except Exception as e:
             logger.error(f"Error sending ticket for booking {booking_id}: {str(e)}")
             # Continue even if ticket sending fails
@@ -589,15 +432,26 @@ def download_ticket(request, booking_id):
             'message': 'Booking not confirmed'
         }, status=400)
     
-    # Generate ticket PDF
-    ticket_generator = TicketGenerator()
-    ticket_path = ticket_generator.generate_ticket(booking)
-    
-    # Return file as attachment
-    with open(ticket_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="ticket_{booking_id}.pdf"'
-        return response
+    if request.GET.get('per') == PER_SEAT:
+        # One page per seat, e.g. to hand out tickets separately; not stored
+        output, _ = BatchTicketRenderer.render([booking], PER_SEAT)
+        return FileResponse(
+            output, as_attachment=True, filename=f"ticket_{booking_id}.pdf", content_type='application/pdf'
+        )
+
+    # Stream the stored ticket; it is only rendered when this version isn't stored yet
+    try:
+        ticket_file, digest = TicketStore.open(booking)
+    except TicketStoreError as e:
+        logger.error(f"Could not get ticket for booking {booking_id}: {e}")
+        return JsonResponse({'error': 'Ticket temporarily unavailable'}, status=503)
+
+    response = FileResponse(
+        ticket_file, as_attachment=True, filename=f"ticket_{booking_id}.pdf", content_type='application/pdf'
+    )
+    response['ETag'] = f'"{digest}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @login_required
 def my_bookings(request):
@@ -668,12 +522,21 @@ def confirm_booking(request):
     selected_seats = Seat.objects.filter(id__in=selected_seat_ids)
     
     # Check if any of the selected seats are already reserved
-    if selected_seats.filter(is_reserved=True).exists():
+    if selected_seats.filter(id__in=SeatInventory.get_reserved_seat_ids(showtime.id)).exists():
         return JsonResponse({
             'success': False,
             'message': 'One or more selected seats are no longer available. Please select different seats.'
         }, status=409)
     
+    # Hold the seats while the user pays
+    try:
+        hold_expires_at = _hold_session_seats(request, showtime, selected_seat_ids)
+    except SeatHoldConflictError:
+        return JsonResponse({
+            'success': False,
+            'message': 'One or more selected seats are being booked by another customer. Please select different seats.'
+        }, status=409)
+    
     # Calculate price
     if hasattr(request.user, 'profile') and request.user.profile.is_student:
         unit_price = showtime.student_price
@@ -684,6 +547,7 @@ def confirm_booking(request):
     
     return JsonResponse({
         'success': True,
+        'hold_expires_at': hold_expires_at.isoformat() if hold_expires_at else None,
         'showtime': {
             'id': showtime.id,
             'movie': {
@@ -698,4 +562,109 @@ def confirm_booking(request):
         'unit_price': float(unit_price),
         'total_price': float(total_price),
         'redirect': '/bookings/payment/'
-    })
\ No newline at end of file
+    })
+
+
+def _hold_session_seats(request, showtime, seat_ids):
+    """
+    Hold the session's selected seats, reusing the existing hold when it still
+    covers the same seats. Returns the hold expiry, or None if holds are unavailable.
+    """
+    seat_hold = request.session.get('seat_hold')
+    try:
+        if seat_hold and seat_hold['showtime_id'] == showtime.id and SeatHoldService.verify(
+                showtime.id, seat_hold['token'], seat_ids, request.user.id):
+            return SeatHoldService.extend(showtime.id, seat_hold['token'], request.user.id)
+
+        _release_session_hold(request)
+        new_hold = SeatHoldService.hold(showtime.id, seat_ids, request.user.id)
+    except SeatHoldConflictError:
+        raise
+    except SeatHoldError as e:
+        # The claim constraint still prevents double booking; we just can't reserve ahead of payment
+        logger.warning(f"Continuing without a seat hold for showtime {showtime.id}: {e}")
+        return None
+
+    request.session['seat_hold'] = {'showtime_id': showtime.id, 'token': new_hold.token}
+    request.session.modified = True
+    return new_hold.expires_at
+
+
+def _session_hold_is_valid(request, showtime, seat_ids):
+    """
+    True if the session holds these seats, taking a hold now if it has none.
+    Raises SeatHoldError when holds can't be checked, so payment fails closed.
+    """
+    seat_hold = request.session.get('seat_hold')
+    if not seat_hold or seat_hold['showtime_id'] != showtime.id:
+        # No hold was taken at seat confirmation (e.g. Redis was down): take one now
+        _release_session_hold(request)
+        try:
+            new_hold = SeatHoldService.hold(showtime.id, seat_ids, request.user.id)
+        except SeatHoldConflictError:
+            return False
+        request.session['seat_hold'] = {'showtime_id': showtime.id, 'token': new_hold.token}
+        request.session.modified = True
+        return True
+    return SeatHoldService.verify(showtime.id, seat_hold['token'], seat_ids, request.user.id)
+
+
+def _queue_booking(request, showtime, seats, total_price, payment_id):
+    """
+    Flash-sale path: record the paid booking as pending and hand the seat claim
+    to the showtime's booking queue writer. The client polls claim_status.
+    """
+    with transaction.atomic():
+        booking = Booking.objects.create(
+            user=request.user,
+            showtime=showtime,
+            booking_time=timezone.now(),
+            payment_id=payment_id,
+            total_price=total_price,
+            status='pending'
+        )
+        booking.seats.set(seats)
+
+    # The writer releases the hold once the claim is decided
+    seat_hold = request.session.pop('seat_hold', None)
+    try:
+        request_id = BookingQueue.submit(booking, [seat.id for seat in seats], hold=seat_hold)
+    except BookingQueueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=503)
+
+    for key in ('showtime_id', 'selected_seat_ids'):
+        request.session.pop(key, None)
+    request.session.modified = True
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Payment received, confirming your seats...',
+        'booking_id': booking.id,
+        'request_id': request_id,
+        'status_url': f"/api/bookings/claim_status/?request_id={request_id}"
+    }, status=202)
+
+
+def _release_session_hold(request):
+    seat_hold = request.session.pop('seat_hold', None)
+    if not seat_hold:
+        return
+    request.session.modified = True
+    try:
+        SeatHoldService.release(seat_hold['showtime_id'], seat_hold['token'], request.user.id)
+    except SeatHoldError as e:
+        logger.warning(f"Could not release seat hold {seat_hold['token']}: {e}")
+
+
+def _schedule_showtimes(movie):
+    """Ask the Celery worker to build showtimes for a movie that has none yet, once per lease"""
+    lease_key = f"showtimes:schedule_requested:{movie.id}"
+    if not cache.add(lease_key, True, SCHEDULE_REQUEST_LEASE):
+        return
+    try:
+        from .tasks import generate_showtimes
+        generate_showtimes.delay(movie_ids=[movie.id])
+        logger.info(f"Scheduled showtime generation for movie {movie.id}")
+    except Exception as e:
+        cache.delete(lease_key)
+        logger.warning(f"Could not schedule showtime generation for movie {movie.id}: {e}")
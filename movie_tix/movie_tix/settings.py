@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
+from celery.schedules import crontab
 
 # Load .env file
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,6 +18,7 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(','
 
 # Applications
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver so WebSockets work in development
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,6 +31,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'drf_yasg',
     'corsheaders',  # Add CORS headers support
+    'channels',
 
     # Local apps
     'users',
@@ -81,6 +84,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'movie_tix.wsgi.application'
+ASGI_APPLICATION = 'movie_tix.asgi.application'
 
 # Database
 DATABASES = {
@@ -139,6 +143,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized TMDB images (see movies.image_proxy). Set IMAGE_PROXY_SENDFILE to 'x-accel' (nginx,
+# with an internal location at IMAGE_PROXY_ACCEL_PREFIX) or 'x-sendfile' to let the web server send the files.
+IMAGE_PROXY_ROOT = MEDIA_ROOT / 'tmdb'
+IMAGE_PROXY_SENDFILE = os.environ.get('IMAGE_PROXY_SENDFILE', '')
+IMAGE_PROXY_ACCEL_PREFIX = '/protected-media/tmdb/'
+
+# Rendered ticket PDFs (see bookings.ticket_store); any alias from Django's STORAGES setting
+TICKET_STORAGE = os.environ.get('TICKET_STORAGE', 'default')
+# Key for the signed ticket QR codes (see bookings.ticket_codes); derived from SECRET_KEY when unset.
+# Door scanners need the same key to validate tickets offline. Codes stay valid this long after the show starts.
+TICKET_SIGNING_KEY = os.environ.get('TICKET_SIGNING_KEY', '')
+TICKET_CODE_VALID_AFTER_START = 3 * 60 * 60
+# Processes encoding QR codes when printing tickets in bulk (see bookings.ticket_batch);
+# started for each batch and stopped after it
+TICKET_BATCH_WORKERS = int(os.environ.get('TICKET_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+
 # Default auto field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -147,6 +167,37 @@ TMDB_API_KEY = os.environ.get('TMDB_API_KEY')
 if not TMDB_API_KEY:
     raise RuntimeError("TMDB_API_KEY is not set in the environment.")
 
+# TMDB HTTP client: connection pool per process, bounded retries on 429/5xx, (connect, read) timeouts
+TMDB_POOL_SIZE = int(os.environ.get('TMDB_POOL_SIZE', 10))
+TMDB_MAX_RETRIES = int(os.environ.get('TMDB_MAX_RETRIES', 3))
+TMDB_BACKOFF_BASE = 0.5
+TMDB_MAX_BACKOFF = 8.0
+TMDB_TIMEOUT = (3.05, 10)
+
+# TMDB circuit breaker: open after this many failed calls within the window (seconds),
+# fail fast while open, then let one probe call through after the reset timeout
+TMDB_BREAKER_FAILURE_THRESHOLD = 5
+TMDB_BREAKER_FAILURE_WINDOW = 60
+TMDB_BREAKER_RESET_TIMEOUT = 30
+
+# TMDB rate limit shared by all processes (token bucket in Redis): requests per second and burst.
+# Background work (catalog sync, cache refreshes) can't use the last 25% of the bucket and waits longer.
+TMDB_RATE_LIMIT = float(os.environ.get('TMDB_RATE_LIMIT', 40))
+TMDB_RATE_BURST = int(os.environ.get('TMDB_RATE_BURST', 40))
+TMDB_RATE_BACKGROUND_RESERVE = 0.25
+TMDB_RATE_MAX_WAIT = {'user': 2.0, 'background': 30.0}
+
+# TMDB movie details cache: serve stale and refresh in the background after the soft TTL,
+# refetch synchronously after the hard TTL; 404s are remembered for a short while (seconds)
+TMDB_DETAILS_SOFT_TTL = int(os.environ.get('TMDB_DETAILS_SOFT_TTL', 60 * 60))
+TMDB_DETAILS_HARD_TTL = int(os.environ.get('TMDB_DETAILS_HARD_TTL', 60 * 60 * 24))
+TMDB_DETAILS_NOT_FOUND_TTL = 60 * 10
+# Parallel detail fetches per batch; kept below TMDB_POOL_SIZE so batches reuse pooled connections
+TMDB_BATCH_WORKERS = int(os.environ.get('TMDB_BATCH_WORKERS', 8))
+
+# TMDB catalog sync: pages of 20 movies pulled from each list per run
+TMDB_CATALOG_PAGES = int(os.environ.get('TMDB_CATALOG_PAGES', 3))
+
 # Email settings (Amazon SES)
 EMAIL_BACKEND = 'django_ses.SESBackend'
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'movietix@example.com')
@@ -159,6 +210,38 @@ AWS_SES_REGION_ENDPOINT = f"email.{AWS_SES_REGION_NAME}.amazonaws.com"
 STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 
+# Redis (seat holds and other shared state)
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Shared cache (seat maps, TMDB responses) so every worker sees the same entries
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://redis:6379/1'),
+    }
+}
+
+# Seat holds: how long selected seats stay held while the user pays (seconds)
+SEAT_HOLD_TTL = int(os.environ.get('SEAT_HOLD_TTL', 600))
+
+# Serialized booking pipeline for flash sales: seat claims go through one writer per
+# partition (Celery queues bookings.p0..bookings.pN-1) instead of racing in request handlers
+BOOKING_QUEUE_ENABLED = os.environ.get('BOOKING_QUEUE_ENABLED', 'False') == 'True'
+BOOKING_QUEUE_PARTITIONS = int(os.environ.get('BOOKING_QUEUE_PARTITIONS', 4))
+
+# Channel layer for live seat map pushes; CHANNEL_LAYER_BACKEND=memory for tests and single-process runs
+if os.environ.get('CHANNEL_LAYER_BACKEND') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+
 # Celery settings (Redis)
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
@@ -166,6 +249,20 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'sweep-expired-seat-holds': {
+        'task': 'bookings.tasks.sweep_expired_seat_holds',
+        'schedule': 30.0,
+    },
+    'generate-showtimes': {
+        'task': 'bookings.tasks.generate_showtimes',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'sync-tmdb-catalog': {
+        'task': 'movies.tasks.sync_tmdb_catalog',
+        'schedule': crontab(minute=30, hour='*/6'),
+    },
+}
 
 # REST Framework
 REST_FRAMEWORK = {
@@ -3,7 +3,10 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import Movie
 from .serializers import MovieSerializer
-from .tmdb_api import fetch_popular_movies, fetch_movie_details, search_movies
+from .autocomplete import MovieAutocomplete
+from .catalog_sync import CatalogSync
+from .search import MovieSearch
+from .tmdb_api import fetch_popular_movies, fetch_movie_details, fetch_movie_details_many, get_tmdb_status
 
 class MovieViewSet(viewsets.ModelViewSet):
     """
@@ -15,10 +18,14 @@ class MovieViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """
-        Get popular movies from TMDB API.
+        Get popular movies from the synced catalog, or TMDB before the first sync.
+        Pass details=true to merge full details (overview, backdrop, trailer) into each movie.
         """
         limit = int(request.query_params.get('limit', 12))
-        movies = fetch_popular_movies(limit=limit)
+        movies = CatalogSync.get_popular_movies(limit=limit) or fetch_popular_movies(limit=limit)
+        if request.query_params.get('details') == 'true':
+            details = fetch_movie_details_many([movie['id'] for movie in movies])
+            movies = [{**movie, **(details.get(movie['id']) or {})} for movie in movies]
         return Response(movies)
     
     @action(detail=False, methods=['get'])
@@ -32,9 +39,28 @@ class MovieViewSet(viewsets.ModelViewSet):
                 {"error": "Query parameter 'q' is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        results = search_movies(query)
+        results = MovieSearch.search(query)
         return Response(results)
     
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Title suggestions for a prefix (?q=), most popular first. Served from memory.
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = max(1, int(request.query_params.get('limit', 10)))
+        except ValueError:
+            return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(MovieAutocomplete.lookup(query, limit) if query.strip() else [])
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def tmdb_status(self, request):
+        """
+        TMDB circuit breaker state and trip count, for monitoring.
+        """
+        return Response(get_tmdb_status())
+
     @action(detail=True, methods=['get'])
     def details(self, request, pk=None):
         """
@@ -0,0 +1,135 @@
+import bisect
+import heapq
+import logging
+import threading
+
+from .models import Movie
+from .search import get_catalog_version, normalize
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 20
+# Prefixes this short match a large share of the catalog; their results are memoized
+SHORT_PREFIX = 2
+
+
+class PrefixIndex:
+    """
+    Sorted array of title keys for prefix lookups with bisect.
+
+    Every word of a title starts a key ("the dark knight", "dark knight",
+    "knight"), so typing any word of a title finds it. A lookup is one
+    binary search plus a scan over the matching run of keys.
+    """
+
+    def __init__(self, movies=()):
+        self.movies = {}
+        keys = []
+        for movie in movies:
+            self.movies[movie.tmdb_id] = PrefixIndex._entry(movie)
+            keys.extend(PrefixIndex._keys(movie.tmdb_id, movie.title))
+        keys.sort()
+        self.keys = keys
+        self._short_results = {}
+
+    @staticmethod
+    def _entry(movie):
+        return {
+            'id': movie.tmdb_id,
+            'title': movie.title,
+            'poster_path': movie.poster_path or None,
+            'release_date': movie.release_date.isoformat() if movie.release_date else None,
+            'popularity': movie.popularity,
+        }
+
+    @staticmethod
+    def _keys(tmdb_id, title):
+        words = normalize(title).split()
+        return [(' '.join(words[i:]), tmdb_id) for i in range(len(words))]
+
+    def add(self, movie):
+        """Insert or update one movie in place"""
+        self.remove(movie.tmdb_id)
+        self.movies[movie.tmdb_id] = PrefixIndex._entry(movie)
+        for key in PrefixIndex._keys(movie.tmdb_id, movie.title):
+            bisect.insort(self.keys, key)
+        self._short_results.clear()
+
+    def remove(self, tmdb_id):
+        entry = self.movies.pop(tmdb_id, None)
+        if entry is None:
+            return
+        for key in PrefixIndex._keys(tmdb_id, entry['title']):
+            index = bisect.bisect_left(self.keys, key)
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+        self._short_results.clear()
+
+    def lookup(self, prefix, limit=10):
+        """Up to `limit` movies with a title word starting with `prefix`, most popular first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX and limit <= MAX_LIMIT:
+            if prefix not in self._short_results:
+                self._short_results[prefix] = self._scan(prefix, MAX_LIMIT)
+            return self._short_results[prefix][:limit]
+        return self._scan(prefix, limit)
+
+    def _scan(self, prefix, limit):
+        matches = set()
+        index = bisect.bisect_left(self.keys, (prefix,))
+        while index < len(self.keys) and self.keys[index][0].startswith(prefix):
+            matches.add(self.keys[index][1])
+            index += 1
+        best = heapq.nlargest(limit, matches, key=lambda tmdb_id: self.movies[tmdb_id]['popularity'])
+        return [self.movies[tmdb_id] for tmdb_id in best]
+
+
+class MovieAutocomplete:
+    """
+    Process-wide PrefixIndex over Movie titles.
+
+    Saves and deletes made in this process patch the index in place (see
+    movies.signals). Changes made elsewhere, such as a catalog sync in a
+    Celery worker, show up as a catalog version we haven't applied and
+    trigger a rebuild on the next lookup.
+    """
+
+    _index = None
+    _index_version = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def lookup(prefix, limit=10):
+        return MovieAutocomplete.get_index().lookup(prefix, min(limit, MAX_LIMIT))
+
+    @staticmethod
+    def get_index():
+        version = get_catalog_version()
+        if MovieAutocomplete._index is None or MovieAutocomplete._index_version != version:
+            with MovieAutocomplete._lock:
+                if MovieAutocomplete._index is None or MovieAutocomplete._index_version != version:
+                    MovieAutocomplete._index = PrefixIndex(
+                        Movie.objects.only('tmdb_id', 'title', 'poster_path', 'release_date', 'popularity')
+                    )
+                    MovieAutocomplete._index_version = version
+                    logger.info(f"Built autocomplete index ({len(MovieAutocomplete._index.movies)} movies)")
+        return MovieAutocomplete._index
+
+    @staticmethod
+    def apply_change(movie, version, deleted=False):
+        """
+        Patch the index for one saved or deleted movie that moved the catalog to
+        `version`. Only done when the index was current just before that change;
+        otherwise it has missed other changes and the next lookup rebuilds it.
+        """
+        with MovieAutocomplete._lock:
+            index = MovieAutocomplete._index
+            if index is None or MovieAutocomplete._index_version != version - 1:
+                return
+            if deleted:
+                index.remove(movie.tmdb_id)
+            else:
+                index.add(movie)
+            MovieAutocomplete._index_version = version
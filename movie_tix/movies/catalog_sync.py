@@ -0,0 +1,163 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Movie
+from .search import bump_catalog_version
+from .tmdb_api import get_tmdb_client
+from .tmdb_client import TMDBError, TMDBNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# TMDB lists pulled into the catalog
+CATALOG_LISTS = {
+    'trending': 'trending/movie/week',
+    'now_playing': 'movie/now_playing',
+    'upcoming': 'movie/upcoming',
+}
+
+# How long a queued one-off sync of a single movie stands before another may be queued
+MOVIE_SYNC_LEASE = 60
+
+SYNCED_FIELDS = ['title', 'overview', 'poster_path', 'backdrop_path', 'release_date', 'popularity', 'synced_at']
+
+
+class CatalogSync:
+    """
+    Keeps the Movie table in step with TMDB's trending, now-playing and upcoming lists.
+
+    Runs from the sync_tmdb_catalog command and the periodic Celery task, so
+    request handlers can read movies from our database instead of waiting on
+    TMDB. Rows are upserted on tmdb_id in one bulk statement per run.
+    """
+
+    @staticmethod
+    def fetch_list(path, pages):
+        """Raw TMDB results for the first `pages` pages of a list"""
+        results = []
+        for page in range(1, pages + 1):
+            data = get_tmdb_client().get(path, params={'language': 'en-US', 'page': page})
+            results.extend(data.get('results', []))
+            if page >= data.get('total_pages', 1):
+                break
+        return results
+
+    @staticmethod
+    def build_movie(result, synced_at):
+        """Unsaved Movie for one TMDB list entry"""
+        release_date = None
+        if result.get('release_date'):
+            try:
+                release_date = parse_date(result['release_date'])
+            except ValueError:
+                logger.warning(f"Invalid release date from TMDB for {result['id']}: {result['release_date']}")
+
+        return Movie(
+            tmdb_id=result['id'],
+            title=(result.get('title') or '')[:255],
+            overview=result.get('overview') or '',
+            poster_path=result.get('poster_path') or '',
+            backdrop_path=result.get('backdrop_path') or '',
+            release_date=release_date,
+            popularity=result.get('popularity') or 0,
+            synced_at=synced_at,
+        )
+
+    @staticmethod
+    def sync(lists=None, pages=None):
+        """
+        Upsert every movie on the given lists (all by default).
+        Returns {list name: number of entries fetched}; failed lists are skipped and reported as None.
+        """
+        pages = pages or settings.TMDB_CATALOG_PAGES
+        synced_at = timezone.now()
+        movies = {}
+        stats = {}
+        for name in lists or CATALOG_LISTS:
+            try:
+                results = CatalogSync.fetch_list(CATALOG_LISTS[name], pages)
+            except TMDBError as e:
+                logger.error(f"Catalog sync could not fetch the {name} list: {e}")
+                stats[name] = None
+                continue
+            stats[name] = len(results)
+            for result in results:
+                if result.get('id') and result.get('title'):
+                    movies[result['id']] = CatalogSync.build_movie(result, synced_at)
+
+        Movie.objects.bulk_create(
+            movies.values(),
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['tmdb_id'],
+            update_fields=SYNCED_FIELDS,
+        )
+        # bulk_create skips the post_save signal, so tell search indexes ourselves
+        bump_catalog_version()
+        logger.info(f"Catalog sync upserted {len(movies)} movies ({stats})")
+        return stats
+
+    @staticmethod
+    def _movie_sync_key(tmdb_id):
+        return f'movies:catalog:sync:{tmdb_id}'
+
+    @staticmethod
+    def _missing_key(tmdb_id):
+        return f'movies:catalog:missing:{tmdb_id}'
+
+    @staticmethod
+    def is_missing(tmdb_id):
+        """True when a recent one-off sync found that TMDB doesn't know the movie"""
+        return cache.get(CatalogSync._missing_key(tmdb_id)) is not None
+
+    @staticmethod
+    def request_movie(tmdb_id):
+        """Queue a one-off sync for a movie the catalog doesn't have yet, once per lease"""
+        lease_key = CatalogSync._movie_sync_key(tmdb_id)
+        if not cache.add(lease_key, True, MOVIE_SYNC_LEASE):
+            return
+        try:
+            from .tasks import sync_tmdb_movie
+            sync_tmdb_movie.delay(tmdb_id)
+            logger.info(f"Queued catalog sync for movie {tmdb_id}")
+        except Exception as e:
+            cache.delete(lease_key)
+            logger.warning(f"Could not queue catalog sync for movie {tmdb_id}: {e}")
+
+    @staticmethod
+    def sync_movie(tmdb_id):
+        """
+        Upsert one movie from TMDB's details endpoint. Returns the Movie, or None
+        (remembered for TMDB_DETAILS_NOT_FOUND_TTL) when TMDB doesn't know it.
+        """
+        try:
+            result = get_tmdb_client().get(f'movie/{tmdb_id}', params={'language': 'en-US'})
+        except TMDBNotFoundError:
+            logger.info(f"TMDB has no movie {tmdb_id}")
+            cache.set(CatalogSync._missing_key(tmdb_id), True, settings.TMDB_DETAILS_NOT_FOUND_TTL)
+            return None
+        finally:
+            cache.delete(CatalogSync._movie_sync_key(tmdb_id))
+
+        Movie.objects.bulk_create(
+            [CatalogSync.build_movie(result, timezone.now())],
+            update_conflicts=True,
+            unique_fields=['tmdb_id'],
+            update_fields=SYNCED_FIELDS,
+        )
+        bump_catalog_version()
+        return Movie.objects.get(tmdb_id=tmdb_id)
+
+    @staticmethod
+    def get_popular_movies(limit=20):
+        """Most popular synced movies in the shape fetch_popular_movies returns"""
+        movies = Movie.objects.filter(synced_at__isnull=False).order_by('-popularity')[:limit]
+        return [{
+            'id': movie.tmdb_id,
+            'title': movie.title,
+            'poster_path': movie.poster_path or None,
+            'release_date': movie.release_date.isoformat() if movie.release_date else None,
+        } for movie in movies]
@@ -0,0 +1,103 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker whose state lives in the shared cache, so every worker
+    trips and recovers together.
+
+    Closed: calls go through and failures are counted within a rolling window.
+    Open: after `failure_threshold` failures, calls fail fast for
+    `reset_timeout` seconds. Half-open: once that expires a single probe call
+    is let through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None, failure_window=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.TMDB_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.TMDB_BREAKER_RESET_TIMEOUT
+        self.failure_window = failure_window or settings.TMDB_BREAKER_FAILURE_WINDOW
+
+    def _key(self, suffix):
+        return f'circuit:{self.name}:{suffix}'
+
+    def get_state(self):
+        values = cache.get_many([self._key('tripped'), self._key('open')])
+        if self._key('tripped') not in values:
+            return CLOSED
+        return OPEN if self._key('open') in values else HALF_OPEN
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead"""
+        state = self.get_state()
+        if state == OPEN:
+            raise CircuitOpenError(self.name)
+        if state == HALF_OPEN and not cache.add(self._key('probe'), True, self.reset_timeout):
+            # Another worker is already probing
+            raise CircuitOpenError(self.name)
+        return state
+
+    def record_success(self, state):
+        if state == CLOSED:
+            if cache.get(self._key('failures')):
+                cache.delete(self._key('failures'))
+            return
+        cache.delete_many([self._key('tripped'), self._key('probe'), self._key('failures')])
+        logger.info(f"Circuit {self.name} closed")
+
+    def record_failure(self, state):
+        now = time.time()
+        cache.set(self._key('last_failure'), now, None)
+        if state == HALF_OPEN:
+            self._trip(now)
+            return
+
+        cache.add(self._key('failures'), 0, self.failure_window)
+        try:
+            failures = cache.incr(self._key('failures'))
+        except ValueError:
+            # Window expired between add and incr
+            cache.set(self._key('failures'), 1, self.failure_window)
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._trip(now)
+
+    def _trip(self, now):
+        cache.set(self._key('tripped'), now, None)
+        cache.set(self._key('open'), now, self.reset_timeout)
+        cache.delete_many([self._key('probe'), self._key('failures')])
+        cache.add(self._key('trips'), 0, None)
+        cache.incr(self._key('trips'))
+        logger.warning(f"Circuit {self.name} opened for {self.reset_timeout}s")
+
+    def get_status(self):
+        """Snapshot of the breaker for monitoring"""
+        values = cache.get_many([self._key(suffix) for suffix in ('tripped', 'failures', 'trips', 'last_failure')])
+        return {
+            'name': self.name,
+            'state': self.get_state(),
+            'failures': values.get(self._key('failures'), 0),
+            'failure_threshold': self.failure_threshold,
+            'trips': values.get(self._key('trips'), 0),
+            'opened_at': values.get(self._key('tripped')),
+            'last_failure_at': values.get(self._key('last_failure')),
+            'reset_timeout': self.reset_timeout,
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"Circuit {name} is open")
@@ -0,0 +1,149 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .rate_limiter import background_priority
+from .single_flight import SingleFlight
+from .tmdb_client import TMDBError, TMDBNotFoundError
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_TIMEOUT = 60
+
+
+class MovieDetailsCache:
+    """
+    Stale-while-revalidate cache for normalized TMDB movie details.
+
+    Entries live until the hard TTL. Past the soft TTL the cached value is
+    still returned immediately while one background refresh (Celery, or a
+    thread when the broker is unreachable) fetches a fresh copy; a failed
+    refresh leaves the stale value in place. Once an entry is gone the next
+    caller fetches synchronously. TMDB 404s are cached briefly as negative
+    entries so unknown IDs don't reach the upstream on every request.
+
+    `loader(movie_id)` returns the details dict and raises TMDBError
+    (TMDBNotFoundError for a 404) on failure.
+    """
+
+    @staticmethod
+    def _key(movie_id):
+        return f'tmdb:details:{movie_id}'
+
+    @staticmethod
+    def _refresh_key(movie_id):
+        return f'tmdb:details:{movie_id}:refreshing'
+
+    @staticmethod
+    def get(movie_id, loader):
+        """Details for `movie_id` (None if TMDB doesn't know it or can't be reached)"""
+        key = MovieDetailsCache._key(movie_id)
+        entry = cache.get(key)
+        if entry is None:
+            # Concurrent misses for the same movie share one fetch
+            entry = SingleFlight.do(
+                key,
+                fetch=lambda: MovieDetailsCache._fetch_entry(movie_id, loader),
+                lookup=lambda: cache.get(key),
+            )
+            return MovieDetailsCache._data(entry)
+
+        if not entry.get('missing') and time.time() - entry['fetched_at'] > settings.TMDB_DETAILS_SOFT_TTL:
+            MovieDetailsCache._schedule_refresh(movie_id, loader)
+        return MovieDetailsCache._data(entry)
+
+    @staticmethod
+    def get_many(movie_ids, loader):
+        """
+        Details for several movies as {movie_id: details or None}. Cache hits come
+        from one cache round trip; misses are fetched in parallel on a bounded
+        thread pool, so a batch costs about one upstream round trip per
+        TMDB_BATCH_WORKERS misses instead of one per movie.
+        """
+        keys = {MovieDetailsCache._key(movie_id): movie_id for movie_id in movie_ids}
+        entries = cache.get_many(list(keys))
+
+        results = {}
+        misses = []
+        for key, movie_id in keys.items():
+            entry = entries.get(key)
+            if entry is None:
+                misses.append(movie_id)
+                continue
+            if not entry.get('missing') and time.time() - entry['fetched_at'] > settings.TMDB_DETAILS_SOFT_TTL:
+                MovieDetailsCache._schedule_refresh(movie_id, loader)
+            results[movie_id] = MovieDetailsCache._data(entry)
+
+        if misses:
+            workers = min(len(misses), settings.TMDB_BATCH_WORKERS)
+            # Pool threads don't inherit context variables such as the rate limiter priority,
+            # so each fetch runs in its own copy of the caller's context
+            contexts = [contextvars.copy_context() for _ in misses]
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tmdb-details') as pool:
+                fetched = pool.map(
+                    lambda context, movie_id: context.run(MovieDetailsCache.get, movie_id, loader),
+                    contexts, misses
+                )
+                results.update(zip(misses, fetched))
+        return results
+
+    @staticmethod
+    def refresh(movie_id, loader):
+        """Fetch details now and store them. Returns the details or None."""
+        return MovieDetailsCache._data(MovieDetailsCache._fetch_entry(movie_id, loader))
+
+    @staticmethod
+    def _fetch_entry(movie_id, loader):
+        """Fetch and store a cache entry; None when TMDB failed and nothing was stored"""
+        key = MovieDetailsCache._key(movie_id)
+        try:
+            data = loader(movie_id)
+        except TMDBNotFoundError:
+            logger.info(f"TMDB has no movie {movie_id}, caching the miss")
+            entry = {'missing': True}
+            cache.set(key, entry, settings.TMDB_DETAILS_NOT_FOUND_TTL)
+            return entry
+        except TMDBError as e:
+            # Keep whatever is cached; it is better than nothing until the hard TTL
+            logger.error(f"Error fetching movie details for {movie_id}: {e}")
+            return None
+
+        entry = {'data': data, 'fetched_at': time.time()}
+        cache.set(key, entry, settings.TMDB_DETAILS_HARD_TTL)
+        return entry
+
+    @staticmethod
+    def _data(entry):
+        return None if entry is None or entry.get('missing') else entry['data']
+
+    @staticmethod
+    def invalidate(movie_id):
+        cache.delete(MovieDetailsCache._key(movie_id))
+
+    @staticmethod
+    def _schedule_refresh(movie_id, loader):
+        # One refresh per entry at a time, across all workers
+        if not cache.add(MovieDetailsCache._refresh_key(movie_id), True, REFRESH_LOCK_TIMEOUT):
+            return
+        try:
+            from .tasks import refresh_movie_details
+            refresh_movie_details.delay(movie_id)
+        except Exception as e:
+            logger.warning(f"Could not queue details refresh for movie {movie_id} ({e}), refreshing in a thread")
+            threading.Thread(
+                target=MovieDetailsCache.refresh_in_background, args=(movie_id, loader), daemon=True
+            ).start()
+
+    @staticmethod
+    def refresh_in_background(movie_id, loader):
+        """Refresh scheduled by get(); releases the refresh lock when done"""
+        try:
+            with background_priority():
+                return MovieDetailsCache.refresh(movie_id, loader)
+        finally:
+            cache.delete(MovieDetailsCache._refresh_key(movie_id))
@@ -0,0 +1,164 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image, UnidentifiedImageError
+
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/original"
+
+# Variant name -> target width in pixels
+VARIANTS = {
+    'poster-thumb': 185,
+    'poster': 342,
+    'poster-large': 500,
+    'backdrop-thumb': 300,
+    'backdrop': 780,
+    'backdrop-large': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# TMDB image paths are a random token plus an extension, e.g. "/kqjL17yufvn9OVLyXYpvtyrFfak.jpg"
+FILENAME_RE = re.compile(r'^[A-Za-z0-9_-]+\.(jpg|jpeg|png)$')
+MAX_ORIGINAL_BYTES = 15 * 1024 * 1024
+# How long a filename TMDB answered 404 for is remembered, so missing images don't reach TMDB on every request
+MISSING_TTL = 60 * 10
+
+_session = requests.Session()
+
+
+class ImageProxy:
+    """
+    Resized poster and backdrop variants of TMDB images.
+
+    The original is downloaded once into IMAGE_PROXY_ROOT/originals; each
+    variant is rendered with Pillow and written to IMAGE_PROXY_ROOT/variants
+    under a content-hash name, so identical outputs are stored once and the
+    hash doubles as the ETag. The (filename, variant, format) -> file mapping
+    is kept in the shared cache; concurrent requests for a variant that
+    doesn't exist yet render it once. Names TMDB answers 404 for are cached
+    for MISSING_TTL, so unknown images don't reach TMDB on every request.
+    """
+
+    @staticmethod
+    def is_valid_filename(filename):
+        return bool(FILENAME_RE.match(filename))
+
+    @staticmethod
+    def url_for(image_path, variant):
+        """Proxy URL for a TMDB poster_path/backdrop_path, or None when there is no image"""
+        if not image_path:
+            return None
+        return reverse('movies:image', args=[variant, image_path.lstrip('/')])
+
+    @staticmethod
+    def _variant_key(filename, variant, fmt):
+        return f'image:{variant}:{fmt}:{filename}'
+
+    @staticmethod
+    def _missing_key(filename):
+        return f'image:missing:{filename}'
+
+    @staticmethod
+    def get_variant(filename, variant, fmt):
+        """Return (relative path under IMAGE_PROXY_ROOT, content hash) of a rendered variant"""
+        key = ImageProxy._variant_key(filename, variant, fmt)
+
+        def lookup():
+            entry = cache.get(key)
+            if entry and os.path.exists(os.path.join(settings.IMAGE_PROXY_ROOT, entry[0])):
+                return entry
+            return None
+
+        entry = lookup()
+        if entry is None:
+            entry = SingleFlight.do(key, fetch=lambda: ImageProxy._render(filename, variant, fmt), lookup=lookup)
+            if entry is None:
+                raise ImageProxyError(f"Timed out rendering {variant} of {filename}")
+        return entry
+
+    @staticmethod
+    def _render(filename, variant, fmt):
+        original = ImageProxy._get_original(filename)
+        pil_format, _, options = FORMATS[fmt]
+        try:
+            with Image.open(original) as image:
+                image = image.convert('RGB')
+                width = VARIANTS[variant]
+                if image.width > width:
+                    image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, **options)
+        except (UnidentifiedImageError, OSError) as e:
+            raise ImageProxyError(f"Could not render {filename}: {e}") from e
+
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()[:24]
+        relative_path = os.path.join('variants', f'{digest}.{fmt}')
+        _write_atomic(os.path.join(settings.IMAGE_PROXY_ROOT, relative_path), data)
+
+        entry = (relative_path, digest)
+        cache.set(ImageProxy._variant_key(filename, variant, fmt), entry, None)
+        logger.info(f"Rendered {variant} {fmt} of {filename}: {len(data)} bytes")
+        return entry
+
+    @staticmethod
+    def _get_original(filename):
+        """Local path of the full-size original, downloading it on first use"""
+        path = os.path.join(settings.IMAGE_PROXY_ROOT, 'originals', filename)
+        if os.path.exists(path):
+            return path
+        if cache.get(ImageProxy._missing_key(filename)) is not None:
+            raise ImageNotFoundError(f"TMDB has no image {filename} (cached)")
+
+        try:
+            response = _session.get(f"{TMDB_IMAGE_BASE_URL}/{filename}", timeout=(3.05, 15), stream=True)
+            if response.status_code == 404:
+                cache.set(ImageProxy._missing_key(filename), True, MISSING_TTL)
+                raise ImageNotFoundError(f"TMDB has no image {filename}")
+            response.raise_for_status()
+            data = response.raw.read(MAX_ORIGINAL_BYTES + 1, decode_content=True)
+        except requests.RequestException as e:
+            raise ImageProxyError(f"Could not download {filename}: {e}") from e
+        if len(data) > MAX_ORIGINAL_BYTES:
+            raise ImageProxyError(f"Original {filename} is larger than {MAX_ORIGINAL_BYTES} bytes")
+
+        _write_atomic(path, data)
+        return path
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ImageProxyError(Exception):
+    """Raised when an image can't be fetched or rendered"""
+    pass
+
+
+class ImageNotFoundError(ImageProxyError):
+    """Raised when TMDB has no image under the requested name"""
+    pass
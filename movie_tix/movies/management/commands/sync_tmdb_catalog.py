@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.catalog_sync import CATALOG_LISTS, CatalogSync
+from movies.rate_limiter import background_priority
+
+
+class Command(BaseCommand):
+    help = "Upsert TMDB trending, now-playing and upcoming movies into the Movie table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='append', dest='lists', choices=sorted(CATALOG_LISTS),
+                            help='Only sync this TMDB list (can be repeated)')
+        parser.add_argument('--pages', type=int,
+                            help='Pages of 20 movies to fetch per list (default: TMDB_CATALOG_PAGES)')
+
+    def handle(self, *args, **options):
+        if options['pages'] is not None and options['pages'] < 1:
+            raise CommandError("--pages must be at least 1")
+
+        with background_priority():
+            stats = CatalogSync.sync(lists=options['lists'], pages=options['pages'])
+        for name, count in stats.items():
+            if count is None:
+                self.stdout.write(self.style.ERROR(f"{name}: failed"))
+            else:
+                self.stdout.write(f"{name}: {count} movie(s)")
+        if all(count is None for count in stats.values()):
+            raise CommandError("Could not fetch any TMDB list")
+        self.stdout.write(self.style.SUCCESS("Catalog sync complete"))
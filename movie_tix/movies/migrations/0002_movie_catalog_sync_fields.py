@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='popularity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
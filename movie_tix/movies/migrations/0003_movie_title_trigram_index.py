@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_title_trigram_index(apps, schema_editor):
+    # Only PostgreSQL has pg_trgm; other databases search through the in-process index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS movies_movie_title_trgm ON movies_movie USING gin (title gin_trgm_ops)"
+    )
+
+
+def drop_title_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS movies_movie_title_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_catalog_sync_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_trigram_index, drop_title_trigram_index),
+    ]
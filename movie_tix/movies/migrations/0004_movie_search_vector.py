@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def create_search_vector(apps, schema_editor):
+    # A stored tsvector column kept up to date by PostgreSQL itself, so the GIN
+    # index below can serve MovieSearch's full-text match. Other databases
+    # search through the in-process index and don't need it.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE movies_movie ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(overview, '')), 'B')"
+        ") STORED"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS movies_movie_search_vector ON movies_movie USING gin (search_vector)"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS movies_movie_search_vector")
+    schema_editor.execute("ALTER TABLE movies_movie DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_title_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
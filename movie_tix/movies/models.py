@@ -7,6 +7,9 @@ class Movie(models.Model):
     poster_path = models.CharField(max_length=255, blank=True)
     backdrop_path = models.CharField(max_length=255, blank=True)
     release_date = models.DateField(null=True, blank=True)
+    # Filled by the TMDB catalog sync (see movies.catalog_sync)
+    popularity = models.FloatField(default=0)
+    synced_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.title
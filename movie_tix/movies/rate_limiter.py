@@ -0,0 +1,172 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+
+from movie_tix.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+USER = 'user'
+BACKGROUND = 'background'
+
+_priority = contextvars.ContextVar('tmdb_priority', default=USER)
+
+# KEYS: bucket hash, metrics hash
+# ARGV: rate (tokens per second), capacity, tokens reserved for user calls, priority
+# Uses the Redis clock so every process agrees on the refill.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor = 0
+if ARGV[4] == 'background' then
+    floor = tonumber(ARGV[3])
+end
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now_ms
+tokens = math.min(capacity, tokens + math.max(0, now_ms - ts) * rate / 1000)
+local wait_ms = 0
+if tokens >= floor + 1 then
+    tokens = tokens - 1
+    redis.call('HINCRBY', KEYS[2], 'granted_' .. ARGV[4], 1)
+else
+    wait_ms = math.ceil((floor + 1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now_ms))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait_ms
+"""
+
+
+def get_priority():
+    return _priority.get()
+
+
+@contextmanager
+def background_priority():
+    """Run TMDB calls in this block as background work (catalog sync, cache refreshes)"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _LocalBucket:
+    """In-process token bucket used while Redis is unreachable"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, floor):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= floor + 1:
+                self.tokens -= 1
+                return 0
+            return math.ceil((floor + 1 - self.tokens) * 1000 / self.rate)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket shared by every process through a Redis Lua script.
+
+    Background calls may not take the last `background_reserve` share of the
+    bucket, so user-facing requests go first when the budget runs low. Callers
+    wait for a token up to a per-priority limit and then get RateLimitExceeded.
+    If Redis is unreachable each process falls back to its own local bucket.
+    Grants, waits and rejections are counted in a Redis hash (see get_metrics).
+    """
+
+    def __init__(self, name, rate=None, capacity=None, background_reserve=None):
+        self.name = name
+        self.rate = rate or settings.TMDB_RATE_LIMIT
+        self.capacity = capacity or settings.TMDB_RATE_BURST
+        reserve = settings.TMDB_RATE_BACKGROUND_RESERVE if background_reserve is None else background_reserve
+        self.reserved_tokens = self.capacity * reserve
+        self.local_bucket = _LocalBucket(self.rate, self.capacity)
+
+    def _bucket_key(self):
+        return f'ratelimit:{self.name}:bucket'
+
+    def _metrics_key(self):
+        return f'ratelimit:{self.name}:metrics'
+
+    def acquire(self, priority=None):
+        """Block until a token is available. Returns seconds waited; raises RateLimitExceeded."""
+        priority = priority or get_priority()
+        max_wait = settings.TMDB_RATE_MAX_WAIT[priority]
+        waited = 0.0
+        while True:
+            wait_ms = self._take(priority)
+            if not wait_ms:
+                if waited:
+                    self._record(priority, waits=1, wait_ms=int(waited * 1000))
+                return waited
+
+            delay = wait_ms / 1000
+            if waited + delay > max_wait:
+                self._record(priority, rejected=1, wait_ms=int(waited * 1000))
+                raise RateLimitExceeded(self.name, priority)
+            time.sleep(delay)
+            waited += delay
+
+    def _take(self, priority):
+        floor = self.reserved_tokens if priority == BACKGROUND else 0
+        try:
+            return get_redis_client().eval(
+                TOKEN_BUCKET_SCRIPT, 2, self._bucket_key(), self._metrics_key(),
+                self.rate, self.capacity, self.reserved_tokens, priority
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter {self.name} using local bucket: {e}")
+            return self.local_bucket.take(floor)
+
+    def _record(self, priority, **counts):
+        try:
+            pipe = get_redis_client().pipeline()
+            for field, value in counts.items():
+                pipe.hincrby(self._metrics_key(), f'{field}_{priority}', value)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not record rate limiter metrics for {self.name}: {e}")
+
+    def get_metrics(self):
+        """Counters per priority: granted, waits, wait_ms (total) and rejected"""
+        try:
+            raw = get_redis_client().hgetall(self._metrics_key())
+        except redis.RedisError as e:
+            logger.warning(f"Could not read rate limiter metrics for {self.name}: {e}")
+            return {}
+        metrics = {}
+        for priority in (USER, BACKGROUND):
+            metrics[priority] = {
+                field: int(raw.get(f'{field}_{priority}', 0))
+                for field in ('granted', 'waits', 'wait_ms', 'rejected')
+            }
+        metrics['rate'] = self.rate
+        metrics['capacity'] = self.capacity
+        return metrics
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no token became available within the caller's wait limit"""
+
+    def __init__(self, name, priority):
+        self.name = name
+        self.priority = priority
+        super().__init__(f"Rate limit {name} exceeded for {priority} call")
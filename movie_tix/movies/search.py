@@ -0,0 +1,175 @@
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Movie
+from .tmdb_api import search_movies
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'movies:catalog:version'
+
+# Minimum trigram similarity for a title to count as a (possibly misspelled) match
+MIN_SIMILARITY = 0.2
+
+
+def get_catalog_version():
+    """Version of the Movie catalog; changes whenever movies are added, updated or removed"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns() // 1000, None)
+        return cache.incr(CATALOG_VERSION_KEY)
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading spaces and one trailing"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def serialize_movie(movie):
+    """Search result in the shape of a TMDB search result"""
+    return {
+        'id': movie.tmdb_id,
+        'title': movie.title,
+        'overview': movie.overview,
+        'poster_path': movie.poster_path or None,
+        'backdrop_path': movie.backdrop_path or None,
+        'release_date': movie.release_date.isoformat() if movie.release_date else None,
+        'popularity': movie.popularity,
+    }
+
+
+class TrigramIndex:
+    """
+    In-process inverted index from title trigrams to movies.
+
+    Scores are trigram similarity (shared / union, as pg_trgm computes it)
+    plus a bonus when the whole query appears in the title, so short
+    prefixes and misspellings both rank sensibly.
+    """
+
+    def __init__(self, movies):
+        self.movies = list(movies)
+        self.titles = [normalize(movie.title) for movie in self.movies]
+        self.grams = [trigrams(movie.title) for movie in self.movies]
+        self.postings = defaultdict(list)
+        for doc, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(doc)
+
+    def search(self, query, limit=20):
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        normalized = normalize(query)
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for doc in self.postings.get(gram, ()):
+                shared[doc] += 1
+
+        scored = []
+        for doc, count in shared.items():
+            similarity = count / (len(query_grams) + len(self.grams[doc]) - count)
+            contains = normalized in self.titles[doc]
+            if similarity >= MIN_SIMILARITY or contains:
+                scored.append((similarity + (0.5 if contains else 0), self.movies[doc].popularity, doc))
+
+        scored.sort(reverse=True)
+        return [self.movies[doc] for _, _, doc in scored[:limit]]
+
+
+class MovieSearch:
+    """
+    Ranked, typo-tolerant search over the synced Movie catalog.
+
+    On PostgreSQL this combines full-text rank (title weighted above overview)
+    with pg_trgm title similarity. Other databases use a TrigramIndex kept in
+    memory and rebuilt when the catalog version changes. TMDB is only asked
+    when the catalog has no match at all.
+    """
+
+    _index = None
+    _index_version = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def search(query, limit=20):
+        query = query.strip()
+        if not query:
+            return []
+        movies = MovieSearch.search_catalog(query, limit)
+        if movies:
+            return [serialize_movie(movie) for movie in movies]
+
+        logger.info(f"No catalog match for '{query}', falling back to TMDB search")
+        return search_movies(query, limit=limit)
+
+    @staticmethod
+    def search_catalog(query, limit=20):
+        if connection.vendor == 'postgresql':
+            return MovieSearch._search_postgres(query, limit)
+        return MovieSearch.get_index().search(query, limit)
+
+    @staticmethod
+    def _search_postgres(query, limit):
+        """
+        Match with `search_vector @@ query OR title % query` so PostgreSQL can
+        answer from the GIN indexes (migrations 0003 and 0004); rank and
+        similarity are only computed for the rows that matched.
+        """
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+
+        # search_vector is a generated column that exists only on PostgreSQL, so it isn't a model field
+        document = RawSQL('"movies_movie"."search_vector"', [], output_field=SearchVectorField())
+        search_query = SearchQuery(query, config='english', search_type='websearch')
+        with transaction.atomic():
+            # The % operator matches at pg_trgm.similarity_threshold; align it with MIN_SIMILARITY for this query
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(MIN_SIMILARITY)])
+            return list(
+                Movie.objects
+                .alias(document=document)
+                .filter(Q(document=search_query) | Q(TrigramSimilar(F('title'), query)))
+                .annotate(rank=SearchRank(F('document'), search_query), similarity=TrigramSimilarity('title', query))
+                .order_by((F('rank') + F('similarity')).desc(), '-popularity')[:limit]
+            )
+
+    @staticmethod
+    def get_index():
+        """The in-process TrigramIndex, rebuilt when the catalog has changed"""
+        version = get_catalog_version()
+        if MovieSearch._index is None or MovieSearch._index_version != version:
+            with MovieSearch._index_lock:
+                if MovieSearch._index is None or MovieSearch._index_version != version:
+                    MovieSearch._index = TrigramIndex(Movie.objects.only(
+                        'tmdb_id', 'title', 'overview', 'poster_path', 'backdrop_path', 'release_date', 'popularity'
+                    ))
+                    MovieSearch._index_version = version
+                    logger.info(f"Built movie search index ({len(MovieSearch._index.movies)} movies)")
+        return MovieSearch._index
@@ -1,10 +1,21 @@
 from rest_framework import serializers
+from .image_proxy import ImageProxy
 from .models import Movie
 
 class MovieSerializer(serializers.ModelSerializer):
     """
     Serializer for the Movie model.
     """
+    poster_url = serializers.SerializerMethodField()
+    backdrop_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Movie
-        fields = ['id', 'tmdb_id', 'title', 'overview', 'poster_path', 'backdrop_path', 'release_date']
\ No newline at end of file
+        fields = ['id', 'tmdb_id', 'title', 'overview', 'poster_path', 'backdrop_path', 'release_date',
+                  'poster_url', 'backdrop_url']
+
+    def get_poster_url(self, obj):
+        return ImageProxy.url_for(obj.poster_path, 'poster')
+
+    def get_backdrop_url(self, obj):
+        return ImageProxy.url_for(obj.backdrop_path, 'backdrop')
\ No newline at end of file
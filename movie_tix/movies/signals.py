@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import MovieAutocomplete
+from .models import Movie
+from .search import bump_catalog_version
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, **kwargs):
+    """Let search indexes know the catalog changed (CatalogSync bumps the version itself)"""
+    MovieAutocomplete.apply_change(instance, bump_catalog_version())
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    MovieAutocomplete.apply_change(instance, bump_catalog_version(), deleted=True)
@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+WAIT_TIMEOUT = 5.0
+LEASE_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+class _Flight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+_flights = {}
+_flights_guard = threading.Lock()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent cache misses for the same key into one upstream fetch.
+
+    Threads of one process share an in-process lock; across processes the
+    first caller takes a short lease with cache.add. Only the lease holder
+    runs `fetch`; everyone else returns `stale` right away when there is one,
+    or polls `lookup` until the holder has stored its result.
+    """
+
+    @staticmethod
+    def do(key, fetch, lookup, stale=None, wait_timeout=WAIT_TIMEOUT, lease_timeout=LEASE_TIMEOUT):
+        """
+        Return `lookup()` if already filled, otherwise the result of one shared `fetch()`.
+        `fetch` must store its result where `lookup` finds it. When another thread or
+        worker is already fetching, `stale` (if given) is returned at once; without
+        it callers wait up to `wait_timeout` seconds for that fetch.
+        """
+        flight = SingleFlight._join(key)
+        try:
+            # With a stale value to serve, never queue behind a thread that is already fetching
+            if stale is not None and not flight.lock.acquire(blocking=False):
+                return stale
+            if stale is None and not flight.lock.acquire(timeout=wait_timeout):
+                logger.warning(f"Timed out waiting for in-process fetch of {key}")
+                return SingleFlight._lookup_or(lookup, stale)
+            try:
+                # Another thread may have filled the cache while we queued
+                value = lookup()
+                if value is not None:
+                    return value
+                return SingleFlight._fetch_with_lease(key, fetch, lookup, stale, wait_timeout, lease_timeout)
+            finally:
+                flight.lock.release()
+        finally:
+            SingleFlight._leave(key, flight)
+
+    @staticmethod
+    def _fetch_with_lease(key, fetch, lookup, stale, wait_timeout, lease_timeout):
+        lease_key = f'singleflight:{key}'
+        token = uuid.uuid4().hex
+        if cache.add(lease_key, token, lease_timeout):
+            try:
+                return fetch()
+            finally:
+                if cache.get(lease_key) == token:
+                    cache.delete(lease_key)
+
+        # Another worker is fetching
+        if stale is not None:
+            return stale
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = lookup()
+            if value is not None:
+                return value
+            if cache.get(lease_key) is None:
+                # The holder gave up without storing anything; don't wait out the timeout
+                break
+        logger.warning(f"No result for {key} from the worker holding its lease")
+        return None
+
+    @staticmethod
+    def _lookup_or(lookup, stale):
+        value = lookup()
+        return stale if value is None else value
+
+    @staticmethod
+    def _join(key):
+        with _flights_guard:
+            flight = _flights.get(key)
+            if flight is None:
+                flight = _flights[key] = _Flight()
+            flight.users += 1
+            return flight
+
+    @staticmethod
+    def _leave(key, flight):
+        with _flights_guard:
+            flight.users -= 1
+            if not flight.users:
+                del _flights[key]
@@ -0,0 +1,32 @@
+import logging
+
+from celery import shared_task
+
+from movies.catalog_sync import CatalogSync
+from movies.details_cache import MovieDetailsCache
+from movies.rate_limiter import background_priority
+from movies.tmdb_api import load_movie_details
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_movie_details(movie_id):
+    """Background half of the details cache: refetch a stale entry"""
+    return MovieDetailsCache.refresh_in_background(movie_id, load_movie_details) is not None
+
+
+@shared_task
+def sync_tmdb_catalog():
+    """Upsert TMDB's trending, now-playing and upcoming lists into the Movie table"""
+    with background_priority():
+        stats = CatalogSync.sync()
+    logger.info(f"TMDB catalog sync finished: {stats}")
+    return stats
+
+
+@shared_task
+def sync_tmdb_movie(tmdb_id):
+    """Upsert a single movie that was requested before the catalog sync picked it up"""
+    movie = CatalogSync.sync_movie(tmdb_id)
+    return movie.id if movie else None
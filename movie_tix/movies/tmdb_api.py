@@ -1,4 +1,3 @@
-import requests
 import logging
 import os
 import sys
@@ -7,6 +6,11 @@ from django.conf import settings
 from django.core.cache import cache
 import json
 
+from .circuit_breaker import OPEN
+from .details_cache import MovieDetailsCache
+from .single_flight import SingleFlight
+from .tmdb_client import TMDB_BASE_URL, TMDBClient, TMDBError
+
 logger = logging.getLogger(__name__)
 
 # First try to get API key from settings
@@ -48,29 +52,49 @@ if not TMDB_API_KEY:
     TMDB_API_KEY = '9c52f42462d276f88fc32d0f13411270'
     logger.warning(f"Using hardcoded TMDB API key for development: {TMDB_API_KEY[:4]}...")
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-
 # Log API key status at module initialization
 if TMDB_API_KEY:
     logger.info(f"TMDB API initialized with key: {TMDB_API_KEY[:4]}...")
 else:
     logger.critical("TMDB API initialization FAILED - no API key available!")
 
+TRENDING_CACHE_KEY = 'tmdb_trending_movies'
+# Last good trending list, served while a single worker refreshes the expired entry
+TRENDING_STALE_KEY = 'tmdb_trending_movies:stale'
+
+_client = None
+
+
+def get_tmdb_client():
+    """Return the process-wide TMDB client, created on first use"""
+    global _client
+    if _client is None:
+        _client = TMDBClient(TMDB_API_KEY, TMDB_BASE_URL)
+    return _client
+
+def get_tmdb_status():
+    """TMDB circuit breaker state and rate limiter metrics for monitoring"""
+    client = get_tmdb_client()
+    return {**client.breaker.get_status(), 'rate_limiter': client.limiter.get_metrics()}
+
+def tmdb_circuit_is_open():
+    return get_tmdb_client().breaker.get_state() == OPEN
+
 # Create test function to verify API key works
 def test_api_key():
     """Tests if the API key is valid by making a simple request"""
     if not TMDB_API_KEY:
         return False, "No API key found"
         
-    url = f"{TMDB_BASE_URL}/configuration?api_key={TMDB_API_KEY}"
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return True, "API key is valid"
-        elif response.status_code == 401:
-            return False, f"API key is invalid. Response: {response.text}"
-        else:
-            return False, f"Unexpected status code: {response.status_code}"
+        get_tmdb_client().get('configuration', timeout=5)
+        return True, "API key is valid"
+    except TMDBError as e:
+        if e.status_code == 401:
+            return False, f"API key is invalid: {e}"
+        elif e.status_code:
+            return False, f"Unexpected status code: {e.status_code}"
+        return False, f"Error testing API key: {str(e)}"
     except Exception as e:
         return False, f"Error testing API key: {str(e)}"
 
@@ -81,30 +105,42 @@ def fetch_popular_movies(limit=20):
         logger.error("Cannot fetch popular movies: No TMDB API key configured")
         return []
         
-    cache_key = 'tmdb_trending_movies'
-    movies = cache.get(cache_key)
+    movies = cache.get(TRENDING_CACHE_KEY)
     if movies is None:
-        url = f"{TMDB_BASE_URL}/trending/movie/week?api_key={TMDB_API_KEY}"
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            movies = []
-            for movie in data.get('results', [])[:limit]:
-                movies.append({
-                    'id': movie['id'],
-                    'title': movie.get('title'),
-                    'poster_path': movie.get('poster_path'),
-                    'release_date': movie.get('release_date'),
-                })
-            cache.set(cache_key, movies, 3600)
-        except requests.RequestException as e:
-            logger.error(f"Error fetching trending movies: {e}")
-            movies = []
+        # One worker refetches when the hourly entry rolls over; the rest get the previous list
+        stale = cache.get(TRENDING_STALE_KEY)
+        movies = SingleFlight.do(
+            TRENDING_CACHE_KEY,
+            fetch=lambda: _load_trending_movies(limit, stale),
+            lookup=lambda: cache.get(TRENDING_CACHE_KEY),
+            stale=stale,
+        )
+    return movies or []
+
+def _load_trending_movies(limit, stale=None):
+    try:
+        data = get_tmdb_client().get('trending/movie/week')
+    except TMDBError as e:
+        logger.error(f"Error fetching trending movies: {e}")
+        return stale or []
+
+    movies = []
+    for movie in data.get('results', [])[:limit]:
+        movies.append({
+            'id': movie['id'],
+            'title': movie.get('title'),
+            'poster_path': movie.get('poster_path'),
+            'release_date': movie.get('release_date'),
+        })
+    cache.set(TRENDING_CACHE_KEY, movies, 3600)
+    cache.set(TRENDING_STALE_KEY, movies, 60 * 60 * 24 * 7)
     return movies
 
 def fetch_movie_details(movie_id):
-    """Fetch movie details from TMDB API and append videos for trailer info."""
+    """
+    Movie details with trailer info, served from the stale-while-revalidate
+    details cache. Returns None for invalid or unknown IDs and when TMDB fails.
+    """
     # Return None if no API key
     if not TMDB_API_KEY:
         logger.error("Cannot fetch movie details: No TMDB API key configured")
@@ -122,23 +158,36 @@ def fetch_movie_details(movie_id):
         logger.error(f"Invalid TMDB ID value (must be positive): {movie_id}")
         return None
 
-    url = f"{TMDB_BASE_URL}/movie/{movie_id}?api_key={TMDB_API_KEY}&append_to_response=videos"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Validate that the ID we received matches the ID we requested
-        if 'id' not in data or data['id'] != movie_id:
-            logger.error(f"TMDB ID mismatch: requested {movie_id}, received {data.get('id')}")
-            return None
-            
-    except requests.RequestException as e:
-        logger.error(f"Error fetching movie details for {movie_id}: {e}")
-        return None
-    except ValueError as e:
-        logger.error(f"Error parsing JSON response for movie {movie_id}: {e}")
-        return None
+    return MovieDetailsCache.get(movie_id, load_movie_details)
+
+def fetch_movie_details_many(movie_ids):
+    """
+    Details for several movies in one call, as {tmdb_id: details or None}.
+    Cached entries are served directly and only misses go to TMDB, in parallel.
+    """
+    if not TMDB_API_KEY:
+        logger.error("Cannot fetch movie details: No TMDB API key configured")
+        return {}
+
+    valid_ids = []
+    for movie_id in movie_ids:
+        try:
+            movie_id = int(movie_id)
+        except (ValueError, TypeError):
+            logger.error(f"Invalid TMDB ID format: {movie_id}")
+            continue
+        if movie_id > 0 and movie_id not in valid_ids:
+            valid_ids.append(movie_id)
+
+    return MovieDetailsCache.get_many(valid_ids, load_movie_details)
+
+def load_movie_details(movie_id):
+    """Fetch movie details from TMDB API and append videos for trailer info. Raises TMDBError."""
+    data = get_tmdb_client().get(f'movie/{movie_id}', params={'append_to_response': 'videos'})
+
+    # Validate that the ID we received matches the ID we requested
+    if 'id' not in data or data['id'] != movie_id:
+        raise TMDBError(f"TMDB ID mismatch: requested {movie_id}, received {data.get('id')}")
 
     # Find trailer key for YouTube trailers
     trailer_key = None
@@ -182,20 +231,16 @@ def search_movies(query, limit=20):
         logger.error("Cannot search movies: No TMDB API key configured")
         return []
         
-    url = f"{TMDB_BASE_URL}/search/movie"
     params = {
-        'api_key': TMDB_API_KEY,
         'language': 'en-US',
         'query': query,
         'page': 1,
         'include_adult': False,
     }
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = get_tmdb_client().get('search/movie', params=params)
         results = data.get('results', [])[:limit]
-    except requests.RequestException as e:
+    except TMDBError as e:
         logger.error(f"Error searching movies with query '{query}': {e}")
         results = []
     return results
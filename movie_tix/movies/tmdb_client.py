@@ -0,0 +1,170 @@
+import logging
+import random
+import time
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .rate_limiter import RateLimitExceeded, TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+
+# Status codes worth another attempt; anything else is returned to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TMDBClient:
+    """
+    Shared HTTP client for the TMDB API.
+
+    Keeps one pooled requests.Session so calls reuse keep-alive connections
+    instead of paying a TCP+TLS handshake each time. Connection errors,
+    timeouts, 429 and 5xx responses are retried a bounded number of times with
+    exponential backoff and full jitter; a Retry-After header from TMDB takes
+    precedence over the computed delay.
+
+    Calls go through a CircuitBreaker shared by all workers: once TMDB keeps
+    failing, get() raises TMDBUnavailableError immediately instead of waiting
+    out timeouts, until a probe call succeeds again. Every attempt, retries
+    included, first takes a token from the TokenBucketLimiter shared by all
+    processes, so bursts are smoothed out before TMDB answers with 429.
+    """
+
+    def __init__(self, api_key, base_url=TMDB_BASE_URL, pool_size=None, max_retries=None,
+                 backoff_base=None, max_backoff=None, timeout=None, breaker=None, limiter=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = settings.TMDB_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.TMDB_BACKOFF_BASE
+        self.max_backoff = max_backoff or settings.TMDB_MAX_BACKOFF
+        self.timeout = timeout or settings.TMDB_TIMEOUT
+        self.breaker = breaker or CircuitBreaker('tmdb')
+        self.limiter = limiter or TokenBucketLimiter('tmdb')
+
+        pool_size = pool_size or settings.TMDB_POOL_SIZE
+        # Retries are handled in _get_with_retries() so that Retry-After and logging stay in one place
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+
+    def get(self, path, params=None, timeout=None):
+        """
+        GET `path` (relative to the API root) and return the decoded JSON body.
+        Raises TMDBNotFoundError on 404 and TMDBError once retries are exhausted.
+        """
+        try:
+            state = self.breaker.before_call()
+        except CircuitOpenError as e:
+            raise TMDBUnavailableError(f"TMDB is unavailable (circuit open), skipped /{path.lstrip('/')}") from e
+
+        try:
+            data = self._get_with_retries(path, params, timeout)
+        except TMDBRateLimitedError:
+            # Throttled on our side; says nothing about TMDB's health
+            raise
+        except TMDBError as e:
+            if e.status_code is not None and e.status_code < 500 and e.status_code != 429:
+                # TMDB answered; the request itself was wrong
+                self.breaker.record_success(state)
+            else:
+                self.breaker.record_failure(state)
+            raise
+        self.breaker.record_success(state)
+        return data
+
+    def _get_with_retries(self, path, params, timeout):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        params = {'api_key': self.api_key, **(params or {})}
+        timeout = timeout or self.timeout
+
+        attempt = 0
+        while True:
+            try:
+                self.limiter.acquire()
+            except RateLimitExceeded as e:
+                raise TMDBRateLimitedError(f"TMDB request to /{path.lstrip('/')} throttled: {e}") from e
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise TMDBError(f"TMDB request to /{path.lstrip('/')} failed: {e}") from e
+                delay = self._backoff(attempt)
+                logger.warning(f"TMDB request to /{path.lstrip('/')} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 404:
+                    raise TMDBNotFoundError(f"TMDB resource not found: /{path.lstrip('/')}", status_code=404)
+                if response.status_code not in RETRY_STATUSES:
+                    return self._decode(response, path)
+                if attempt >= self.max_retries:
+                    raise TMDBError(
+                        f"TMDB request to /{path.lstrip('/')} failed with status {response.status_code}",
+                        status_code=response.status_code
+                    )
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(f"TMDB returned {response.status_code} for /{path.lstrip('/')}, retrying in {delay:.2f}s")
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _decode(self, response, path):
+        try:
+            response.raise_for_status()
+            return response.json()
+        except requests.HTTPError as e:
+            raise TMDBError(str(e), status_code=response.status_code) from e
+        except ValueError as e:
+            raise TMDBError(f"Invalid JSON from TMDB for /{path.lstrip('/')}: {e}") from e
+
+    def _backoff(self, attempt):
+        # Full jitter: anywhere between 0 and the exponential cap
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        """Seconds to wait according to a Retry-After header, or None if absent or unparseable"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(dt_timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0), self.max_backoff)
+
+    def close(self):
+        self.session.close()
+
+
+class TMDBError(Exception):
+    """Raised when TMDB can't be reached or keeps failing"""
+
+    def __init__(self, message, status_code=None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class TMDBNotFoundError(TMDBError):
+    """Raised when TMDB answers 404 for the requested resource"""
+    pass
+
+
+class TMDBUnavailableError(TMDBError):
+    """Raised without calling TMDB while its circuit breaker is open"""
+    pass
+
+
+class TMDBRateLimitedError(TMDBError):
+    """Raised when no rate limit token became available in time"""
+    pass
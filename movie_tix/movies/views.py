@@ -1,7 +1,14 @@
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.conf import settings
+from django.utils.cache import patch_vary_headers
+import logging
 import os
-from .tmdb_api import fetch_popular_movies, fetch_movie_details, search_movies
+from .catalog_sync import CatalogSync
+from .image_proxy import FORMATS, VARIANTS, ImageNotFoundError, ImageProxy, ImageProxyError
+from .search import MovieSearch
+from .tmdb_api import fetch_popular_movies, fetch_movie_details, tmdb_circuit_is_open
+
+logger = logging.getLogger(__name__)
 
 def movie_list_view(request):
     """
@@ -10,15 +17,19 @@ def movie_list_view(request):
     # Check if TMDB API key is configured
     api_key = settings.TMDB_API_KEY or os.environ.get('TMDB_API_KEY', '')
     
-    # Try to get movies from API
-    movies = fetch_popular_movies(limit=21)
+    # Serve the synced catalog; only go to TMDB before the first sync
+    movies = CatalogSync.get_popular_movies(limit=21) or fetch_popular_movies(limit=21)
     
     # If no movies were returned, and we appear to have an API key,
-    # there might be a connectivity issue - test the API key
+    # there might be a connectivity issue - test the API key,
+    # unless the circuit breaker already knows TMDB is down
     api_working = True
     if not movies and api_key:
-        from movies.tmdb_api import test_api_key
-        api_working, message = test_api_key()
+        if tmdb_circuit_is_open():
+            api_working = False
+        else:
+            from movies.tmdb_api import test_api_key
+            api_working, message = test_api_key()
         
     # If API is not working or no movies, use mock data in development
     if not movies and settings.DEBUG:
@@ -108,5 +119,49 @@ def search_results_view(request):
     API view to handle movie search queries.
     """
     query = request.GET.get('q', '')
-    results = search_movies(query) if query else []
+    results = MovieSearch.search(query) if query else []
     return JsonResponse({'query': query, 'results': results})
+
+def image_view(request, variant, filename):
+    """
+    Resized TMDB poster or backdrop. WebP for clients that accept it, JPEG
+    otherwise (?format= overrides). Variants never change, so they are cached for a year.
+    """
+    if variant not in VARIANTS or not ImageProxy.is_valid_filename(filename):
+        return JsonResponse({'error': 'Unknown image'}, status=404)
+
+    fmt = request.GET.get('format')
+    if fmt not in FORMATS:
+        fmt = 'webp' if 'image/webp' in request.META.get('HTTP_ACCEPT', '') else 'jpeg'
+
+    try:
+        relative_path, digest = ImageProxy.get_variant(filename, variant, fmt)
+    except ImageNotFoundError:
+        return JsonResponse({'error': 'Image not found'}, status=404)
+    except ImageProxyError as e:
+        logger.error(f"Image proxy failed for {variant}/{filename}: {e}")
+        return JsonResponse({'error': 'Image temporarily unavailable'}, status=502)
+
+    etag = f'"{digest}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = _send_image(relative_path, FORMATS[fmt][1])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    if 'format' not in request.GET:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+def _send_image(relative_path, content_type):
+    """Hand the file to the front-end server when configured, otherwise stream it"""
+    if settings.IMAGE_PROXY_SENDFILE == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.IMAGE_PROXY_ACCEL_PREFIX}{relative_path}"
+        return response
+    path = os.path.join(settings.IMAGE_PROXY_ROOT, relative_path)
+    if settings.IMAGE_PROXY_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    return FileResponse(open(path, 'rb'), content_type=content_type)